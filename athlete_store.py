@@ -0,0 +1,145 @@
+# Athlete database: every completion and its VO2max, kept in SQLite across sessions.
+# Results are queued and written by a background thread in batches, one transaction each.
+#     python athlete_store.py --athlete "Somchai" --team "M4/1"
+#     python athlete_store.py --team "M4/1"
+import queue
+import sqlite3
+import threading
+
+ATHLETE_DB = "athletes.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS athletes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    team TEXT NOT NULL DEFAULT '',
+    sex TEXT,
+    UNIQUE (name, team)
+);
+CREATE INDEX IF NOT EXISTS athletes_team ON athletes (team);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    athlete_id INTEGER NOT NULL REFERENCES athletes (id),
+    session TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    shuttle INTEGER NOT NULL,
+    distance REAL NOT NULL,
+    elapsed REAL NOT NULL,
+    age INTEGER,
+    vo2max REAL,
+    UNIQUE (session, slot)
+);
+CREATE INDEX IF NOT EXISTS results_athlete_date ON results (athlete_id, date);
+CREATE INDEX IF NOT EXISTS results_date ON results (date);
+"""
+
+INSERT_ATHLETE = "INSERT INTO athletes (name, team, sex) VALUES (?, ?, ?) ON CONFLICT (name, team) DO UPDATE SET sex = COALESCE(excluded.sex, sex)"
+SELECT_ATHLETE = "SELECT id FROM athletes WHERE name = ? AND team = ?"
+# Results are keyed by roster slot within the session, so two players sharing a name never replace
+# each other, while re-recording a recovered session replaces rather than duplicates
+INSERT_RESULT = ("INSERT OR REPLACE INTO results (athlete_id, session, slot, date, protocol, level, shuttle, distance, elapsed, age, vo2max) "
+                 "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+_CLOSE = object()  # Tells the writer thread to commit and stop
+
+def connect(path=ATHLETE_DB, check_same_thread=True):
+    connection = sqlite3.connect(path, check_same_thread=check_same_thread)
+    connection.execute("PRAGMA journal_mode = WAL")  # Readers never wait for the writer
+    connection.executescript(SCHEMA)
+    return connection
+
+class AthleteStore:
+    def __init__(self, path=ATHLETE_DB):
+        self.path = path
+        self.queue = queue.SimpleQueue()
+        self.written = 0
+        # Opened here so a missing directory or locked database raises to the caller; from then on
+        # only the writer thread uses the connection
+        self.connection = connect(path, check_same_thread=False)
+        self.thread = threading.Thread(target=self._writer, name="athlete-store", daemon=True)
+        self.thread.start()
+
+    def add_result(self, name, team, sex, session, slot, date, protocol, level, shuttle, distance, elapsed, age=None,
+                   vo2max=None):
+        # Safe to call from any thread; only queues the result. `slot` is the player's roster index.
+        self.queue.put((name, team or "", sex, session, slot, date, protocol, level, shuttle, distance, elapsed, age, vo2max))
+
+    def close(self):
+        self.queue.put(_CLOSE)
+        self.thread.join()
+
+    def _writer(self):
+        connection = self.connection
+        athlete_ids = {}  # (name, team) -> id, so known athletes skip the lookup
+        while True:
+            results = [self.queue.get()]
+            # Everything already queued goes into the same transaction
+            while True:
+                try:
+                    results.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = _CLOSE in results
+            rows = []
+            with connection:
+                for result in results:
+                    if result is _CLOSE:
+                        continue
+                    name, team, sex = result[:3]
+                    athlete_id = athlete_ids.get((name, team))
+                    if athlete_id is None or sex:
+                        connection.execute(INSERT_ATHLETE, (name, team, sex))
+                        athlete_id = connection.execute(SELECT_ATHLETE, (name, team)).fetchone()[0]
+                        athlete_ids[name, team] = athlete_id
+                    rows.append((athlete_id,) + result[3:])
+                connection.executemany(INSERT_RESULT, rows)
+            self.written += len(rows)
+            if closing:
+                break
+        connection.close()
+
+def find_athletes(connection, name, team=None):
+    # (id, name, team, sex) of every athlete with this name, optionally within one team
+    if team is None:
+        return connection.execute("SELECT id, name, team, sex FROM athletes WHERE name = ?", (name,)).fetchall()
+    return connection.execute("SELECT id, name, team, sex FROM athletes WHERE name = ? AND team = ?", (name, team)).fetchall()
+
+def history(connection, athlete_id):
+    # Every result of one athlete, oldest first
+    return connection.execute(
+        "SELECT date, session, protocol, level, shuttle, distance, elapsed, age, vo2max FROM results "
+        "WHERE athlete_id = ? ORDER BY date", (athlete_id,)).fetchall()
+
+def team_best(connection, team, since=None, until=None):
+    # Best distance of each athlete in a team per year, best first within each year
+    return connection.execute(
+        "SELECT substr(r.date, 1, 4) AS year, a.name, MAX(r.distance) AS distance, r.level, r.shuttle, r.vo2max "
+        "FROM athletes a JOIN results r ON r.athlete_id = a.id "
+        "WHERE a.team = ? AND r.date >= ? AND r.date <= ? "
+        "GROUP BY year, a.id ORDER BY year, distance DESC",
+        (team, since or "0000", until or "9999")).fetchall()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Look up athlete history in the results database")
+    parser.add_argument("--db", default=ATHLETE_DB)
+    parser.add_argument("--athlete", help="show every result of this athlete")
+    parser.add_argument("--team", help="team of the athlete, or show the team's best results per year")
+    args = parser.parse_args()
+
+    connection = connect(args.db)
+    if args.athlete:
+        for athlete_id, name, team, sex in find_athletes(connection, args.athlete, args.team):
+            print(f"{name} ({team or 'no team'}, {sex or 'sex unknown'})")
+            for date, session, protocol, level, shuttle, distance, elapsed, age, vo2max in history(connection, athlete_id):
+                score = f", VO2max {vo2max:.1f}" if vo2max is not None else ""
+                print(f"  {date} {protocol}: Level {level} Shuttle {shuttle} Distance {distance:.1f} m{score}")
+    elif args.team:
+        for year, name, distance, level, shuttle, vo2max in team_best(connection, args.team):
+            score = f", VO2max {vo2max:.1f}" if vo2max is not None else ""
+            print(f"{year} {name}: Level {level} Shuttle {shuttle} Distance {distance:.1f} m{score}")
+    connection.close()
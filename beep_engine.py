@@ -0,0 +1,431 @@
+# Beep test engine: protocol timeline, beep scheduler and the shuttle state machine.
+# Nothing here needs Tk or audio hardware, so it also runs headless:
+#     python beep_engine.py --csv timeline.csv
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+def calculate_time_per_shuttle(speed, distance=20):
+    time_per_shuttle = (distance / (speed * 1000 / 3600))  # speed in m/s
+    return time_per_shuttle
+
+# Sleep until this close to a deadline, then spin for the rest (nanoseconds)
+SPIN_THRESHOLD_NS = 2_000_000
+
+# State of the test at some elapsed time
+ShuttleState = namedtuple("ShuttleState", "index level shuttle speed distance remaining")
+
+class ProtocolTimeline:
+    # The protocol flattened into one entry per shuttle, compiled once so lookups never recompute.
+    # `recovery` seconds of rest follow every `recovery_every`-th shuttle of a level (Yo-Yo tests).
+    def __init__(self, protocol, shuttle_distance=20, recovery=0.0, recovery_every=0):
+        self.shuttle_distance = shuttle_distance
+        self.levels = array("H")
+        self.shuttles = array("H")
+        self.speeds = array("d")
+        self.durations = array("d")  # Seconds
+        self.start_times = array("d")  # Seconds from the start of the test
+        self.start_ns = array("q")  # Same, in integer nanoseconds for the scheduler
+        self.distances = array("d")  # Metres covered before the shuttle starts
+        self.recovery_ns = array("q")  # Rest after the shuttle before the next one starts
+        self.level_index = {}  # Level -> index of its first shuttle
+        self.level_shuttles = {}  # Level -> number of shuttles in it
+
+        elapsed = 0.0
+        for level in sorted(protocol):
+            num_shuttles, speed = protocol[level]
+            time_per_shuttle = calculate_time_per_shuttle(speed, shuttle_distance)
+            self.level_index[level] = len(self.levels)
+            self.level_shuttles[level] = num_shuttles
+            for shuttle in range(1, num_shuttles + 1):
+                self.levels.append(level)
+                self.shuttles.append(shuttle)
+                self.speeds.append(speed)
+                self.durations.append(time_per_shuttle)
+                self.start_times.append(elapsed)
+                # Rounded from the cumulative time so rounding never accumulates across shuttles
+                self.start_ns.append(round(elapsed * 1e9))
+                self.distances.append(len(self.distances) * shuttle_distance)
+                elapsed += time_per_shuttle
+                rest = recovery if recovery_every and shuttle % recovery_every == 0 else 0.0
+                self.recovery_ns.append(round(rest * 1e9))
+                elapsed += rest
+        if self.recovery_ns:
+            # No rest is scheduled after the final shuttle
+            elapsed -= self.recovery_ns[-1] / 1e9
+            self.recovery_ns[-1] = 0
+        self.total_time = elapsed
+        self.total_ns = round(elapsed * 1e9)
+        self.total_distance = float(len(self.levels) * shuttle_distance)
+
+    def __len__(self):
+        return len(self.levels)
+
+    def index_of(self, level, shuttle):
+        # Index of a level/shuttle; one past the end once the protocol is finished
+        if level not in self.level_index:
+            return len(self)
+        if not (1 <= shuttle <= self.level_shuttles[level]):
+            raise ValueError(f"shuttle {shuttle} is outside 1-{self.level_shuttles[level]} for level {level}")
+        return self.level_index[level] + shuttle - 1
+
+    def elapsed_at(self, level, shuttle):
+        index = self.index_of(level, shuttle)
+        if index >= len(self):
+            return self.total_time
+        return self.start_times[index]
+
+    def deadline_ns(self, index):
+        if index < len(self):
+            return self.start_ns[index]
+        return self.total_ns
+
+    def state_at(self, elapsed):
+        index = max(bisect_right(self.start_times, elapsed) - 1, 0)
+        if elapsed >= self.total_time:
+            return ShuttleState(len(self), self.levels[-1], self.shuttles[-1], self.speeds[-1], self.total_distance, 0.0)
+        next_start = self.start_times[index + 1] if index + 1 < len(self) else self.total_time
+        return ShuttleState(index, self.levels[index], self.shuttles[index], self.speeds[index],
+                            self.distances[index], next_start - elapsed)
+
+    def states_at(self, elapsed_times):
+        return [self.state_at(elapsed) for elapsed in elapsed_times]
+
+    def position(self, index):
+        # Level, shuttle and total distance shown once `index` shuttles have been run
+        if index >= len(self):
+            return self.levels[-1] + 1, 1, self.total_distance
+        return self.levels[index], self.shuttles[index], self.distances[index]
+
+class BeepScheduler:
+    def __init__(self, timeline, clock=time.perf_counter_ns, sleep=time.sleep, spin_threshold_ns=SPIN_THRESHOLD_NS):
+        self.timeline = timeline
+        self.clock = clock  # Monotonic nanosecond clock
+        self.sleep = sleep
+        self.spin_threshold_ns = spin_threshold_ns
+        self.start_ns = None
+        self.offsets_ns = []  # Actual minus intended time of every beep fired
+
+    def start(self, index=0, delay_ns=0):
+        # Anchor the schedule so that shuttle `index` is due `delay_ns` from now
+        self.start_ns = self.clock() + delay_ns - self.timeline.deadline_ns(index)
+        self.offsets_ns = []
+
+    def deadline(self, index):
+        return self.start_ns + self.timeline.deadline_ns(index)
+
+    def wait_until(self, deadline_ns, running=lambda: True):
+        # Sleep through most of the gap and spin only for the last few milliseconds
+        while running():
+            remaining_ns = deadline_ns - self.clock()
+            if remaining_ns <= 0:
+                return True
+            if remaining_ns > self.spin_threshold_ns:
+                self.sleep((remaining_ns - self.spin_threshold_ns) / 1e9)
+        return False
+
+    def mark_fired(self, index):
+        self.offsets_ns.append(self.clock() - self.deadline(index))
+
+    def drift_report(self):
+        if not self.offsets_ns:
+            return {"beeps": 0, "cumulative_drift_ms": 0.0, "mean_late_ms": 0.0, "max_late_ms": 0.0}
+        return {
+            "beeps": len(self.offsets_ns),
+            # Offsets are measured against absolute deadlines, so the last one is the total drift
+            "cumulative_drift_ms": self.offsets_ns[-1] / 1e6,
+            "mean_late_ms": sum(self.offsets_ns) / len(self.offsets_ns) / 1e6,
+            "max_late_ms": max(self.offsets_ns) / 1e6,
+        }
+
+# Protocol definitions shipped as data files, one JSON file per test variant
+PROTOCOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "protocols")
+DEFAULT_PROTOCOL = "msft-20m"
+
+def load_protocol(path):
+    # Read and validate one protocol file; levels become {level: (shuttles, speed)}
+    with open(path, encoding="utf-8") as protocol_file:
+        data = json.load(protocol_file)
+    name = os.path.basename(path)
+    levels = {}
+    for entry in data.get("levels", []):
+        level, shuttles, speed = entry.get("level"), entry.get("shuttles"), entry.get("speed")
+        if not isinstance(level, int) or level < 1 or level in levels:
+            raise ValueError(f"{name}: invalid or duplicate level {level!r}.")
+        if not isinstance(shuttles, int) or shuttles < 1:
+            raise ValueError(f"{name}: level {level} needs a positive number of shuttles.")
+        if not isinstance(speed, (int, float)) or speed <= 0:
+            raise ValueError(f"{name}: level {level} needs a positive speed.")
+        levels[level] = (shuttles, float(speed))
+    if not levels:
+        raise ValueError(f"{name}: no levels defined.")
+    distance = data.get("shuttle_distance", 20)
+    recovery = data.get("recovery", 0)
+    recovery_every = data.get("recovery_every", 0)
+    if not isinstance(distance, (int, float)) or distance <= 0:
+        raise ValueError(f"{name}: shuttle_distance must be positive.")
+    if not isinstance(recovery, (int, float)) or recovery < 0:
+        raise ValueError(f"{name}: recovery cannot be negative.")
+    if not isinstance(recovery_every, int) or recovery_every < 0:
+        raise ValueError(f"{name}: recovery_every must be a whole number of shuttles.")
+    return {
+        "name": data.get("name", name),
+        "description": data.get("description", ""),
+        "shuttle_distance": distance,
+        "recovery": recovery,
+        "recovery_every": recovery_every,
+        "levels": levels,
+    }
+
+class ProtocolRegistry:
+    # Every protocol in a directory, each compiled into a timeline at most once and shared
+    def __init__(self, directory=PROTOCOL_DIR):
+        self.definitions = {}
+        self.timelines = {}
+        self.lock = threading.Lock()
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith(".json"):
+                self.definitions[file_name[:-5]] = load_protocol(os.path.join(directory, file_name))
+
+    def names(self):
+        return list(self.definitions)
+
+    def get(self, key):
+        return self.definitions[key]
+
+    def timeline(self, key):
+        with self.lock:
+            if key not in self.timelines:
+                definition = self.definitions[key]
+                self.timelines[key] = ProtocolTimeline(definition["levels"], definition["shuttle_distance"],
+                                                       definition["recovery"], definition["recovery_every"])
+            return self.timelines[key]
+
+registry = ProtocolRegistry()
+
+# The default protocol, compiled once at startup
+protocol = registry.get(DEFAULT_PROTOCOL)["levels"]
+timeline = registry.timeline(DEFAULT_PROTOCOL)
+
+class VirtualClock:
+    # Simulated nanosecond clock for headless runs: sleeping advances it instantly
+    def __init__(self, start_ns=0):
+        self.now_ns = start_ns
+
+    def __call__(self):
+        return self.now_ns
+
+    def sleep(self, seconds):
+        self.now_ns += max(round(seconds * 1e9), 0)
+
+class NullAudio:
+    # Audio sink that plays nothing and records when each cue was requested
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.played = []  # (name, clock time in ns)
+
+    def play(self, name="beep", channel=0):
+        self.played.append((name, self.clock()))
+
+class LaneAudio:
+    # Sends one lane's cues to its own mixer channel of a shared audio engine
+    def __init__(self, audio, channel):
+        self.audio = audio
+        self.channel = channel
+
+    def play(self, name="beep"):
+        self.audio.play(name, self.channel)
+
+class BeepTestEngine:
+    # The shuttle state machine behind a test run: fires each beep on its deadline and
+    # tracks level, shuttle and distance from the timeline
+    def __init__(self, timeline, audio=None, clock=time.perf_counter_ns, sleep=time.sleep,
+                 spin_threshold_ns=SPIN_THRESHOLD_NS):
+        self.timeline = timeline
+        self.audio = audio if audio is not None else NullAudio(clock)
+        self.scheduler = BeepScheduler(timeline, clock, sleep, spin_threshold_ns)
+        self.running = False
+        self.seek(0)
+
+    def seek(self, index):
+        self.index = index
+        self.level, self.shuttle, self.total_distance = self.timeline.position(index)
+
+    def elapsed(self):
+        # Seconds into the protocol: live while running, otherwise where the test stopped
+        if self.running and self.scheduler.start_ns is not None:
+            return min(self.scheduler.clock() - self.scheduler.start_ns, self.timeline.total_ns) / 1e9
+        return self.timeline.deadline_ns(self.index) / 1e9
+
+    def run(self, wait=None, on_shuttle=None, countdown=0, on_countdown=None):
+        # `wait(deadline_ns)` fills the time between beeps (the app refreshes its countdown there)
+        # and `on_shuttle(engine)` is called after every shuttle. With a `countdown` of n seconds the
+        # first shuttle is scheduled n seconds out, a tick sounds on each second before it and
+        # `on_countdown(seconds_left)` is called on each tick and with 0 as the first shuttle starts.
+        if wait is None:
+            wait = lambda deadline_ns: self.scheduler.wait_until(deadline_ns, lambda: self.running)
+        if self.index >= len(self.timeline):
+            self.running = False  # Nothing left to run, so no countdown either
+            return self.scheduler.drift_report()
+        self.scheduler.start(self.index, countdown * 1_000_000_000)
+        first_deadline = self.scheduler.deadline(self.index)
+        for seconds_left in range(countdown, 0, -1):
+            if not self.scheduler.wait_until(first_deadline - seconds_left * 1_000_000_000, lambda: self.running):
+                return self.scheduler.drift_report()
+            self.audio.play("tick")
+            if on_countdown:
+                on_countdown(seconds_left)
+        if not self.scheduler.wait_until(first_deadline, lambda: self.running):
+            return self.scheduler.drift_report()
+        self.fire("go" if countdown else None)  # The end of a countdown is the first beep
+        if countdown and on_countdown:
+            on_countdown(0)
+        while True:
+            recovery_ns = self.timeline.recovery_ns[self.index]
+            if recovery_ns:
+                wait(self.scheduler.deadline(self.index + 1) - recovery_ns)
+                if self.running:
+                    self.audio.play("double")  # End of the run; recovery starts
+            wait(self.scheduler.deadline(self.index + 1))
+            if not self.running:
+                return self.scheduler.drift_report()  # Stopped during this shuttle, so it was not completed
+            self.advance()
+            if self.running:
+                self.fire()  # The next shuttle starts on this deadline, before any bookkeeping
+            if on_shuttle:
+                on_shuttle(self)
+            if not self.running:
+                return self.scheduler.drift_report()
+
+    def fire(self, cue=None):
+        # Beep for the start of the current shuttle; a triple beep announces a new level
+        self.audio.play(cue or ("triple" if self.shuttle == 1 and self.index else "beep"))
+        self.scheduler.mark_fired(self.index)
+
+    def advance(self):
+        # The current shuttle is over; move on to the next one
+        self.seek(self.index + 1)
+        if self.index >= len(self.timeline):
+            self.running = False
+
+# What a SessionManager deadline means for its session
+SHUTTLE_START = 0  # First beep of the session
+SHUTTLE_END = 1  # Current shuttle is over; the next one starts
+RECOVERY_START = 2  # Running part is over; rest until the next shuttle
+
+class SessionManager:
+    # Runs several independent tests (e.g. staggered groups on adjacent lanes) from a single
+    # scheduling thread: the next deadline of every session is kept in one heap
+    def __init__(self, clock=time.perf_counter_ns, sleep=time.sleep, spin_threshold_ns=SPIN_THRESHOLD_NS):
+        self.clock = clock
+        self.sleep = sleep
+        self.spin_threshold_ns = spin_threshold_ns
+        self.sessions = []  # (engine, start delay in ns, on_shuttle)
+        self.running = False
+
+    def add_session(self, timeline, audio=None, start_delay=0.0, on_shuttle=None):
+        # `start_delay` is in seconds from start(); `on_shuttle(engine)` runs after each of its shuttles
+        engine = BeepTestEngine(timeline, audio, self.clock, self.sleep, self.spin_threshold_ns)
+        self.sessions.append((engine, round(start_delay * 1e9), on_shuttle))
+        return engine
+
+    def run(self):
+        self.running = True
+        order = itertools.count()  # Tie-breaker so the heap never compares engines
+        heap = []
+        for engine, delay_ns, on_shuttle in self.sessions:
+            engine.running = True
+            engine.scheduler.start(engine.index, delay_ns)
+            heapq.heappush(heap, (engine.scheduler.deadline(engine.index), next(order), engine, on_shuttle, SHUTTLE_START))
+
+        waiter = BeepScheduler(None, self.clock, self.sleep, self.spin_threshold_ns)
+        while self.running and heap:
+            deadline_ns, _, engine, on_shuttle, phase = heapq.heappop(heap)
+            if not engine.running:
+                continue  # Session was stopped on its own
+            if not waiter.wait_until(deadline_ns, lambda: self.running):
+                break
+            next_start = engine.scheduler.deadline(engine.index + 1)
+            if phase == RECOVERY_START:
+                engine.audio.play("double")  # End of the run; recovery starts
+                heapq.heappush(heap, (next_start, next(order), engine, on_shuttle, SHUTTLE_END))
+                continue
+            if phase == SHUTTLE_END:
+                engine.advance()
+            if engine.running and engine.index < len(engine.timeline):
+                engine.fire()
+                recovery_ns = engine.timeline.recovery_ns[engine.index]
+                next_start = engine.scheduler.deadline(engine.index + 1)
+                if recovery_ns:
+                    heapq.heappush(heap, (next_start - recovery_ns, next(order), engine, on_shuttle, RECOVERY_START))
+                else:
+                    heapq.heappush(heap, (next_start, next(order), engine, on_shuttle, SHUTTLE_END))
+            if phase == SHUTTLE_END and on_shuttle:
+                on_shuttle(engine)  # After the next beep, so bookkeeping never delays it
+        self.running = False
+        return [engine.scheduler.drift_report() for engine, _, _ in self.sessions]
+
+    def stop(self):
+        self.running = False
+        for engine, _, _ in self.sessions:
+            engine.running = False
+
+def simulate(timeline=timeline, start_index=0, observe=None):
+    # Run a whole session on a virtual clock with a null audio sink; takes milliseconds.
+    # `observe(engine)` is called in the middle of every shuttle, where the app's display runs.
+    clock = VirtualClock()
+    engine = BeepTestEngine(timeline, NullAudio(clock), clock, clock.sleep, spin_threshold_ns=0)
+    engine.seek(start_index)
+    engine.running = True
+
+    def observed_wait(deadline_ns):
+        observe(engine)
+        engine.scheduler.wait_until(deadline_ns, lambda: engine.running)
+
+    engine.run(wait=observed_wait if observe else None)
+    return engine
+
+if __name__ == "__main__":
+    import argparse
+    import csv
+
+    parser = argparse.ArgumentParser(description="Simulate a beep test session without Tk or audio")
+    parser.add_argument("--level", type=int, default=1, help="level to start from")
+    parser.add_argument("--shuttle", type=int, default=1, help="shuttle to start from")
+    parser.add_argument("--csv", help="write the simulated beep timeline to this file")
+    args = parser.parse_args()
+    if args.level not in timeline.level_index:
+        parser.error(f"level {args.level} is outside {min(timeline.level_index)}-{max(timeline.level_index)}")
+    try:
+        first = timeline.index_of(args.level, args.shuttle)
+    except ValueError as error:
+        parser.error(str(error))
+
+    started = time.perf_counter()
+    engine = simulate(timeline, first)
+    summary = {
+        "beeps": len(engine.audio.played),
+        "simulated_s": engine.scheduler.clock() / 1e9,
+        "final_level": engine.level,
+        "final_shuttle": engine.shuttle,
+        "total_distance": engine.total_distance,
+        "drift": engine.scheduler.drift_report(),
+        "wall_ms": (time.perf_counter() - started) * 1000,
+    }
+    print(json.dumps(summary, indent=2))
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["index", "level", "shuttle", "speed_kmh", "distance_m", "intended_s", "beep_s"])
+            start_ns = engine.scheduler.start_ns
+            for offset, (_, beep_ns) in enumerate(engine.audio.played):
+                index = first + offset
+                writer.writerow([index, timeline.levels[index], timeline.shuttles[index], timeline.speeds[index],
+                                 timeline.distances[index], timeline.start_times[index], (beep_ns - start_ns) / 1e9])
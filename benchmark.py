@@ -0,0 +1,181 @@
+# Beep timing benchmark: runs the engine headless on the real clock and reports how far each
+# beep lands from its intended shuttle boundary.
+#     python benchmark.py --json bench.json
+#     python benchmark.py --compare bench.json
+# The protocol is sped up (--speedup) so a full 21-level run finishes in seconds. The engine is
+# driven the way the app drives it: a frame-paced countdown fills the time between beeps and a
+# per-shuttle hook saves a checkpoint and serialises a live-stream event.
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from beep_engine import protocol, ProtocolTimeline, BeepTestEngine, NullAudio
+from checkpoint import Checkpointer
+
+# Upper bounds (microseconds) of the histogram buckets; the last bucket catches everything above
+HISTOGRAM_BUCKETS_US = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# Refresh rate of the app's remaining-time display
+FRAME_HZ = 30
+
+def scaled_protocol(levels, speedup):
+    # Same shuttle counts, speeds multiplied so every shuttle is `speedup` times shorter
+    return {level: (protocol[level][0], protocol[level][1] * speedup) for level in levels}
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(round(fraction * (len(sorted_values) - 1)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def frame_paced_wait(engine, frame_hz=FRAME_HZ):
+    # The app's update_timer without Tk: format the remaining time once a frame, sleep between
+    # frames but never into the spin window, and leave the rest to the scheduler
+    frame_ns = round(1e9 / frame_hz)
+
+    def wait(deadline_ns):
+        next_frame = time.perf_counter_ns()
+        last_sleep = deadline_ns - engine.scheduler.spin_threshold_ns
+        last_text = None
+        while engine.running:
+            now = time.perf_counter_ns()
+            if now >= deadline_ns:
+                break
+            text = f"Time: {(deadline_ns - now) / 1e9:.3f} s"
+            if text != last_text:
+                last_text = text  # Where the app posts the new text to its label
+            next_frame += frame_ns
+            if next_frame < last_sleep:
+                time.sleep(max(next_frame - time.perf_counter_ns(), 0) / 1e9)
+            else:
+                engine.scheduler.wait_until(deadline_ns, lambda: engine.running)
+
+    return wait
+
+def shuttle_hook(checkpoints):
+    # What the app's on_shuttle does on the beep thread: checkpoint the position and build a stream event
+    def on_shuttle(engine):
+        state = {"session": "benchmark", "protocol": "benchmark", "index": engine.index, "level": engine.level,
+                 "shuttle": engine.shuttle, "distance": engine.total_distance, "time": time.time()}
+        checkpoints.save(state)
+        json.dumps({"event": "tick", **state}).encode("utf-8")
+
+    return on_shuttle
+
+def run_scenario(name, levels, speedup):
+    timeline = ProtocolTimeline(scaled_protocol(levels, speedup))
+    audio = NullAudio()
+    engine = BeepTestEngine(timeline, audio)
+    engine.running = True
+
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoints = Checkpointer(os.path.join(directory, "checkpoint.json"))
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        engine.run(wait=frame_paced_wait(engine), on_shuttle=shuttle_hook(checkpoints))
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        checkpoints.close()
+
+    # Intended vs actual time of every beep, in microseconds
+    offsets_us = [(beep_ns - engine.scheduler.deadline(index)) / 1e3
+                  for index, (_, beep_ns) in enumerate(audio.played)]
+    jitter = sorted(abs(offset) for offset in offsets_us)
+    histogram = [0] * (len(HISTOGRAM_BUCKETS_US) + 1)
+    for value in jitter:
+        bucket = 0
+        while bucket < len(HISTOGRAM_BUCKETS_US) and value > HISTOGRAM_BUCKETS_US[bucket]:
+            bucket += 1
+        histogram[bucket] += 1
+
+    return {
+        "name": name,
+        "levels": [min(levels), max(levels)],
+        "speedup": speedup,
+        "beeps": len(offsets_us),
+        "p50_us": percentile(jitter, 0.50),
+        "p95_us": percentile(jitter, 0.95),
+        "p99_us": percentile(jitter, 0.99),
+        "max_us": jitter[-1] if jitter else 0.0,
+        "cumulative_drift_us": offsets_us[-1] if offsets_us else 0.0,
+        "cpu_percent": cpu / wall * 100 if wall else 0.0,
+        "wall_s": wall,
+        "histogram": histogram,
+    }
+
+def format_histogram(result):
+    lines = [f"{result['name']}: {result['beeps']} beeps, jitter p50 {result['p50_us']:.1f} us, "
+             f"p95 {result['p95_us']:.1f} us, p99 {result['p99_us']:.1f} us, max {result['max_us']:.1f} us, "
+             f"drift {result['cumulative_drift_us']:.1f} us, CPU {result['cpu_percent']:.1f}%"]
+    peak = max(result["histogram"]) or 1
+    lower = 0
+    for bucket, count in enumerate(result["histogram"]):
+        if bucket < len(HISTOGRAM_BUCKETS_US):
+            label = f"{lower:>6}-{HISTOGRAM_BUCKETS_US[bucket]:<6} us"
+            lower = HISTOGRAM_BUCKETS_US[bucket]
+        else:
+            label = f"{lower:>6}+{'':<6} us"
+        lines.append(f"  {label} | {'#' * round(count / peak * 40):<40} {count}")
+    return "\n".join(lines)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_levels(text):
+    # "5-8" -> [5, 6, 7, 8]; every level must be in the protocol
+    first, _, last = text.partition("-")
+    try:
+        levels = list(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise ValueError(f"levels {text!r} is not a range like 1-5") from None
+    if not levels:
+        raise ValueError(f"levels {text!r} is an empty range")
+    if levels[0] not in protocol or levels[-1] not in protocol:
+        raise ValueError(f"levels {text!r} is outside {min(protocol)}-{max(protocol)}")
+    return levels
+
+def compare(results, baseline):
+    lines = ["Change against baseline" + (f" {baseline['commit']}" if baseline.get("commit") else "") + ":"]
+    previous = {result["name"]: result for result in baseline["scenarios"]}
+    for result in results:
+        before = previous.get(result["name"])
+        if before is None:
+            continue
+        changes = ", ".join(f"{key} {result[key] - before[key]:+.1f}"
+                            for key in ("p50_us", "p95_us", "p99_us", "max_us", "cpu_percent"))
+        lines.append(f"  {result['name']}: {changes}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark beep timing accuracy of the engine")
+    parser.add_argument("--speedup", type=float, default=100.0, help="how many times faster than real time to run")
+    parser.add_argument("--levels", action="append", help="level range for a partial run, e.g. 1-5 (repeatable)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    scenarios = [("full", sorted(protocol))]
+    for text in args.levels or ["1-3", "19-21"]:
+        try:
+            scenarios.append((f"levels {text}", parse_levels(text)))
+        except ValueError as error:
+            parser.error(str(error))
+
+    results = [run_scenario(name, levels, args.speedup) for name, levels in scenarios]
+    for result in results:
+        print(format_histogram(result))
+
+    report = {"commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "scenarios": results}
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+    if args.compare:
+        with open(args.compare) as json_file:
+            print(compare(results, json.load(json_file)))
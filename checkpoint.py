@@ -0,0 +1,89 @@
+# Checkpoint of the running test's position, so a crashed session can resume where it stopped.
+# save() only hands the state over; a background thread writes the newest state and replaces the
+# file atomically, so the beep thread never waits on the disk.
+import json
+import os
+import threading
+import time
+from collections import deque
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+class Checkpointer:
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        self.pending = None  # Newest state not yet written; older ones are simply replaced
+        self.lock = threading.Lock()  # Only held to hand over state, never while writing
+        self.generation = 0  # Bumped by clear(), so a write already under way is undone
+        self.wake = threading.Event()
+        self.closed = False
+        self.save_ns = deque(maxlen=1024)  # Cost of save() to the caller
+        self.write_ns = deque(maxlen=1024)  # Cost of each write on the background thread
+        self.thread = threading.Thread(target=self._writer, name="checkpoint", daemon=True)
+        self.thread.start()
+
+    def save(self, state):
+        start = time.perf_counter_ns()
+        with self.lock:
+            self.pending = state
+        self.wake.set()
+        self.save_ns.append(time.perf_counter_ns() - start)
+
+    def clear(self):
+        # The test ended normally; there is nothing to resume
+        with self.lock:
+            self.pending = None
+            self.generation += 1
+            self._remove()
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+        self.thread.join()
+
+    def _writer(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            with self.lock:
+                state, self.pending = self.pending, None
+                generation = self.generation
+            if state is not None:
+                start = time.perf_counter_ns()
+                temp_path = self.path + ".tmp"
+                with open(temp_path, "w") as checkpoint_file:
+                    json.dump(state, checkpoint_file)
+                    checkpoint_file.flush()
+                    os.fsync(checkpoint_file.fileno())
+                os.replace(temp_path, self.path)
+                self.write_ns.append(time.perf_counter_ns() - start)
+                with self.lock:
+                    if self.generation != generation:
+                        self._remove()
+            if self.closed:
+                break
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def report(self):
+        save_us = [ns / 1e3 for ns in self.save_ns] or [0.0]
+        write_ms = [ns / 1e6 for ns in self.write_ns] or [0.0]
+        return {
+            "writes": len(self.write_ns),
+            "mean_save_us": sum(save_us) / len(save_us),
+            "max_save_us": max(save_us),
+            "mean_write_ms": sum(write_ms) / len(write_ms),
+            "max_write_ms": max(write_ms),
+        }
+
+def load_checkpoint(path=CHECKPOINT_FILE):
+    # The last checkpoint written, or None if there is none or it cannot be read
+    try:
+        with open(path) as checkpoint_file:
+            return json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return None
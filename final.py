@@ -1,52 +1,343 @@
-import tkinter as tk
-from PIL import Image, ImageTk
-import pygame
 import time
+STARTUP_T0 = time.perf_counter()  # Reference point for --profile-startup
+
+import tkinter as tk
+import os
+import sys
 import threading
+import sqlite3
+from array import array
+from bisect import insort
+from collections import OrderedDict, deque
 from tkinter import simpledialog  # Import simpledialog
-
-# Initialize Pygame for audio playback
-pygame.mixer.init()
-
-# Updated Beep Test protocol
-protocol = {
-    1: (7, 8.0),
-    2: (8, 9.0),
-    3: (8, 9.5),
-    4: (9, 10.0),
-    5: (9, 10.5),
-    6: (10, 11.0),
-    7: (10, 11.5),
-    8: (11, 12.0),
-    9: (11, 12.5),
-    10: (11, 13.0),
-    11: (12, 13.5),
-    12: (12, 14.0),
-    13: (13, 14.5),
-    14: (13, 15.0),
-    15: (13, 15.5),
-    16: (14, 16.0),
-    17: (14, 16.5),
-    18: (15, 17.0),
-    19: (15, 17.5),
-    20: (16, 18.0),
-    21: (16, 18.5),
-}
-
-def calculate_time_per_shuttle(speed):
-    distance = 20  # 20 meters
-    time_per_shuttle = (distance / (speed * 1000 / 3600))  # speed in m/s
-    return time_per_shuttle
+from tkinter import filedialog, messagebox
+import vo2max
+import results_log
+import live_stream
+import session_archive
+import roster_import
+import profiling
+import athlete_store
+import tones
+import checkpoint
+import input_devices
+from beep_engine import protocol, registry, DEFAULT_PROTOCOL, BeepTestEngine, LaneAudio, SessionManager
+
+# Mixer settings: a small buffer keeps the delay between play() and sound output short
+MIXER_FREQUENCY = 44100
+MIXER_BUFFER = 256  # Samples per buffer
+MIXER_CUE_CHANNELS = 4  # Channels reserved for cues, one per lane in a multi-lane session
+
+class AudioEngine:
+    def __init__(self, frequency=MIXER_FREQUENCY, buffer=MIXER_BUFFER, tone_frequency=tones.TONE_FREQUENCY,
+                 tone_duration=tones.TONE_DURATION):
+        start = time.perf_counter_ns()
+        import pygame  # Imported here so it does not slow down opening the window
+        pygame.mixer.pre_init(frequency, -16, 2, buffer)
+        pygame.mixer.init()
+        self.init_ns = time.perf_counter_ns() - start
+        # Reserve the cue channels so nothing else can steal them
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), MIXER_CUE_CHANNELS))
+        pygame.mixer.set_reserved(MIXER_CUE_CHANNELS)
+        self.channels = [pygame.mixer.Channel(channel) for channel in range(MIXER_CUE_CHANNELS)]
+
+        # Cues are synthesised to match the mixer's output format, so no file is decoded
+        actual_frequency, _, channels = pygame.mixer.get_init()
+        self.sounds = {}
+        self.load_ns = {}
+        for name, segments in tones.cue_definitions(tone_frequency, tone_duration).items():
+            start = time.perf_counter_ns()
+            self.sounds[name] = pygame.mixer.Sound(buffer=tones.synthesize(segments, actual_frequency, channels))
+            self.load_ns[name] = time.perf_counter_ns() - start
+
+        self.buffer_latency_ns = round(buffer / actual_frequency * 1e9)
+        self.play_ns = deque(maxlen=1024)  # Duration of recent play() calls
+
+    def play(self, name="beep", channel=0):
+        start = time.perf_counter_ns()
+        self.channels[channel % len(self.channels)].play(self.sounds[name])
+        self.play_ns.append(time.perf_counter_ns() - start)
+
+    def latency_report(self):
+        play_ms = [ns / 1e6 for ns in self.play_ns] or [0.0]
+        mean_play_ms = sum(play_ms) / len(play_ms)
+        return {
+            "load_ms": {name: ns / 1e6 for name, ns in self.load_ns.items()},
+            "mean_play_ms": mean_play_ms,
+            "max_play_ms": max(play_ms),
+            "buffer_ms": self.buffer_latency_ns / 1e6,
+            # Time from play() being called until the sound reaches the output device
+            "audible_ms": mean_play_ms + self.buffer_latency_ns / 1e6,
+        }
+
+class DeferredAudio:
+    # Builds the AudioEngine on a background thread so the window can paint first.
+    # Cues requested before loading has finished wait for it.
+    def __init__(self, **options):
+        self.options = options  # Passed on to AudioEngine
+        self.engine = None
+        self.error = None
+        self.load_ns = 0
+        self.ready = threading.Event()
+
+    def start(self, on_ready=None):
+        threading.Thread(target=self._load, args=(on_ready,), name="audio-loader", daemon=True).start()
+
+    def _load(self, on_ready):
+        start = time.perf_counter_ns()
+        try:
+            self.engine = AudioEngine(**self.options)
+        except Exception as error:  # Keep the app usable; report why there is no sound
+            self.error = error
+            print(f"Audio unavailable: {error}")
+        self.load_ns = time.perf_counter_ns() - start
+        self.ready.set()
+        if on_ready:
+            on_ready(self)
+
+    def play(self, name="beep", channel=0):
+        self.ready.wait()
+        if self.engine:
+            self.engine.play(name, channel)
+
+    def latency_report(self):
+        self.ready.wait()
+        if self.engine:
+            return self.engine.latency_report()
+        return {"load_ms": {}, "mean_play_ms": 0.0, "max_play_ms": 0.0, "buffer_ms": 0.0, "audible_ms": 0.0}
+
+class StartupProfile:
+    # Wall time of each startup phase, printed with --profile-startup
+    def __init__(self, origin=STARTUP_T0):
+        self.origin = origin
+        self.last = origin
+        self.phases = []  # (phase, duration in s, finished at s since origin)
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last, now - self.origin))
+        self.last = now
+
+    def add(self, phase, duration, finished):
+        self.phases.append((phase, duration, finished - self.origin))
+
+    def report(self):
+        lines = ["Startup profile:"]
+        for phase, duration, finished in self.phases:
+            lines.append(f"  {phase:<24} {duration * 1000:8.1f} ms   (done at {finished * 1000:8.1f} ms)")
+        return "\n".join(lines)
+
+# Number of PhotoImages kept in memory, and where pre-scaled copies are saved (None to disable)
+ASSET_CACHE_SIZE = 8
+ASSET_CACHE_DIR = ".asset_cache"
+
+class AssetStore:
+    # Decodes and resizes each image once per size and display scale, keeping the PhotoImages in an LRU
+    def __init__(self, root, max_images=ASSET_CACHE_SIZE, cache_dir=ASSET_CACHE_DIR):
+        self.root = root
+        self.max_images = max_images
+        self.cache_dir = cache_dir
+        self.images = OrderedDict()
+
+    def display_scale(self):
+        # Tk scaling is pixels per point; 96 DPI (scale 1.0) is what the layout was designed for
+        return round(float(self.root.tk.call("tk", "scaling")) / (96 / 72), 2)
+
+    def photo(self, path, size):
+        scale = self.display_scale()
+        pixel_size = (round(size[0] * scale), round(size[1] * scale))
+        mtime = os.stat(path).st_mtime_ns
+        key = (path, pixel_size, mtime)
+        if key in self.images:
+            self.images.move_to_end(key)
+            return self.images[key]
+
+        from PIL import ImageTk  # Only needed for the dialogs, so loaded on first use
+        photo = ImageTk.PhotoImage(self.load_scaled(path, pixel_size, mtime))
+        self.images[key] = photo
+        while len(self.images) > self.max_images:
+            self.images.popitem(last=False)
+        return photo
+
+    def load_scaled(self, path, pixel_size, mtime):
+        from PIL import Image
+        cached_path = None
+        if self.cache_dir:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            cached_path = os.path.join(self.cache_dir, f"{stem}-{pixel_size[0]}x{pixel_size[1]}-{mtime}.png")
+            if os.path.exists(cached_path):
+                try:
+                    image = Image.open(cached_path)
+                    image.load()
+                    return image
+                except OSError:
+                    pass  # Unreadable cache entry; rebuild it below
+
+        image = Image.open(path)
+        image = image.resize(pixel_size, Image.LANCZOS)
+        if cached_path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                temp_path = cached_path + ".tmp"
+                image.save(temp_path, "PNG")
+                os.replace(temp_path, cached_path)
+            except OSError:
+                pass  # The disk cache is only an optimisation
+        return image
+
+# How often the Tk main loop applies updates posted by worker threads (milliseconds)
+UI_DRAIN_INTERVAL_MS = 15
+
+class UIDispatcher:
+    # Tk is not thread-safe: worker threads post widget updates here and the main loop applies them
+    def __init__(self, root, interval_ms=UI_DRAIN_INTERVAL_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.pending = deque()  # append/popleft are atomic, so posting needs no lock
+        self.applied = 0
+        self.coalesced = 0
+        self.root.after(self.interval_ms, self.drain)
+
+    def post(self, key, func, *args, **kwargs):
+        # Updates sharing a key replace each other; key None is always applied
+        self.pending.append((key, func, args, kwargs))
+
+    def config(self, widget, **options):
+        self.post((str(widget), tuple(sorted(options))), widget.config, **options)
+
+    def call(self, func, *args, **kwargs):
+        self.post(None, func, *args, **kwargs)
+
+    def drain(self):
+        # Rescheduled first, so an update that raises cannot stop every later one from being applied
+        self.root.after(self.interval_ms, self.drain)
+        batch = {}
+        for _ in range(len(self.pending)):
+            key, func, args, kwargs = self.pending.popleft()
+            if key is None:
+                key = object()
+            elif key in batch:
+                self.coalesced += 1
+            batch[key] = (func, args, kwargs)
+        for func, args, kwargs in batch.values():
+            try:
+                func(*args, **kwargs)
+            except tk.TclError:
+                pass  # Widget was destroyed before the update reached it
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())  # Reported as Tk would, then carry on
+            self.applied += 1
+
+# Refresh rate of the remaining-time display (frames per second)
+DISPLAY_REFRESH_HZ = 30
+
+class CountdownDisplay:
+    # Remaining-time label refreshed at a capped frame rate, redrawn only when its text changes
+    def __init__(self, label, ui, refresh_hz=DISPLAY_REFRESH_HZ):
+        self.label = label
+        self.ui = ui
+        self.frame_ns = round(1e9 / refresh_hz)
+        self.last_text = None
+        self.frames = 0
+        self.redraws = 0
+        self.cpu_ns = 0  # CPU time spent by the refresh loop
+        self.wall_ns = 0  # Wall time the refresh loop was active
+
+    def render(self, remaining_ns):
+        self.frames += 1
+        text = f"Time: {max(remaining_ns, 0) / 1e9:.3f} s"
+        if text != self.last_text:
+            self.ui.config(self.label, text=text)
+            self.last_text = text
+            self.redraws += 1
+
+    def cpu_ms_per_second(self):
+        if not self.wall_ns:
+            return 0.0
+        return self.cpu_ns / self.wall_ns * 1000
+
+# Number of player rows that have widgets; the rest of the roster is scrolled through them
+ROSTER_VISIBLE_ROWS = 10
+
+class RosterModel:
+    # Player state kept in flat lists, so the roster size does not depend on widget count
+    def __init__(self, size=10):
+        self.names = []
+        self.completed = bytearray()
+        self.results = []
+        # Structured result of each completed player, for the session archive
+        self.levels = array("H")
+        self.shuttles = array("H")
+        self.distances = array("d")
+        self.elapsed = array("d")
+        # Age (0 when unknown) and "Male"/"Female"/None of each player, for VO2max scoring
+        self.ages = array("H")
+        self.sexes = []
+        self.teams = []
+        self.selected = bytearray()  # Ticked for the next "Drop Out Selected"
+        self.named = bytearray()  # Set once a real name was given; placeholders are not stored per athlete
+        self.add_players(size)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_players(self, count):
+        first = len(self.names) + 1
+        self.names.extend(f"Player {player_id}" for player_id in range(first, first + count))
+        self.completed.extend(bytes(count))
+        self.results.extend([None] * count)
+        self.levels.extend(array("H", [0]) * count)
+        self.shuttles.extend(array("H", [0]) * count)
+        self.distances.extend(array("d", [0.0]) * count)
+        self.elapsed.extend(array("d", [0.0]) * count)
+        self.ages.extend(array("H", [0]) * count)
+        self.sexes.extend([None] * count)
+        self.teams.extend([""] * count)
+        self.selected.extend(bytes(count))
+        self.named.extend(bytes(count))
+
+    def clear(self):
+        # Remove every player, emptying each column in place
+        for column in (self.names, self.completed, self.results, self.levels, self.shuttles, self.distances,
+                       self.elapsed, self.ages, self.sexes, self.teams, self.selected, self.named):
+            del column[:]
+
+    def load(self, athletes):
+        # Replace the whole roster with imported (name, age, sex, team) rows
+        self.clear()
+        self.add_players(len(athletes))
+        self.names[:] = [name for name, _, _, _ in athletes]
+        self.ages[:] = array("H", [age or 0 for _, age, _, _ in athletes])
+        self.sexes[:] = [sex for _, _, sex, _ in athletes]
+        self.teams[:] = [team for _, _, _, team in athletes]
+        self.named[:] = b"\1" * len(athletes)
+
+    def rename(self, index, name):
+        self.names[index] = name
+        self.named[index] = 1
+
+    def complete(self, index, result, level=0, shuttle=0, distance=0.0, elapsed=0.0):
+        self.completed[index] = 1
+        self.selected[index] = 0
+        self.results[index] = result
+        self.levels[index] = level
+        self.shuttles[index] = shuttle
+        self.distances[index] = distance
+        self.elapsed[index] = elapsed
 
 class PlayerPanel:
-    def __init__(self, parent, player_id, app, player_name=None):
-        self.player_id = player_id
-        self.player_name = player_name if player_name else f"Player {player_id}"
+    # One recycled row of the roster view; shows whichever player it is bound to
+    def __init__(self, parent, row, app):
+        self.index = None  # Roster index of the player currently shown
         self.app = app  # Store reference to the main app instance
         self.frame = tk.Frame(parent, borderwidth=2, relief=tk.RAISED, bg="#2E2E2E")
-        self.frame.grid(row=player_id-1, column=0, padx=10, pady=5, sticky='ew')
+        self.frame.grid(row=row, column=0, padx=10, pady=5, sticky='ew')
 
-        self.label = tk.Label(self.frame, text=f"{self.player_name}: In Progress", font=("Arial", 12), bg="#2E2E2E", fg="#FFFFFF")
+        self.selected = tk.IntVar(value=0)
+        self.select_box = tk.Checkbutton(self.frame, variable=self.selected, command=self.toggle, bg="#2E2E2E", activebackground="#2E2E2E", selectcolor="#2E2E2E")
+        self.select_box.pack(side=tk.LEFT, padx=(10, 0))
+
+        self.label = tk.Label(self.frame, text="", font=("Arial", 12), bg="#2E2E2E", fg="#FFFFFF")
         self.label.pack(side=tk.LEFT, padx=10, expand=True, fill=tk.X)
 
         self.complete_button = tk.Button(self.frame, text="Complete", font=("Arial", 12), command=self.mark_complete, bg="#4CAF50", fg="#FFFFFF", relief=tk.FLAT)
@@ -55,33 +346,343 @@ class PlayerPanel:
         self.change_name_button = tk.Button(self.frame, text="Change Name", font=("Arial", 12), command=self.change_name, bg="#FFA500", fg="#FFFFFF", relief=tk.FLAT)
         self.change_name_button.pack(side=tk.RIGHT, padx=10)
 
-        self.result = None  # Store result here
+    def show(self, index):
+        self.index = index
+        roster = self.app.roster
+        self.selected.set(roster.selected[index])
+        if roster.completed[index]:
+            self.label.config(text=f"{roster.names[index]}: Completed")
+            self.complete_button.config(state=tk.DISABLED)
+            self.select_box.config(state=tk.DISABLED)
+        else:
+            self.label.config(text=f"{roster.names[index]}: In Progress")
+            self.complete_button.config(state=tk.NORMAL)
+            self.select_box.config(state=tk.NORMAL)
+
+    def toggle(self):
+        self.app.roster.selected[self.index] = self.selected.get()
 
     def mark_complete(self):
-        if self.app.level and self.app.shuttle and self.app.total_distance is not None:
-            self.result = f"Level {self.app.level} Shuttle {self.app.shuttle - 1} Distance {self.app.total_distance:.1f} m"
-            self.label.config(text=f"{self.player_name}: Completed")
-            self.complete_button.config(state=tk.DISABLED)
-            self.app.show_result(self.player_name, self.result)  # Pass player_name instead of player_id
+        stamp_ns = self.app.engine.scheduler.clock()  # Taken first, so the result is when the click happened
+        self.app.complete_players([self.index], stamp_ns)
 
     def change_name(self):
         new_name = simpledialog.askstring("Change Player Name", "Enter new name:")
         if new_name:
-            self.player_name = new_name
-            self.label.config(text=f"{self.player_name}: In Progress")
+            self.app.roster.rename(self.index, new_name)
+            self.show(self.index)
+            self.app.log_event("rename", index=self.index, name=new_name)
+
+class RosterView:
+    # Scrollable roster that only creates widgets for the visible rows and rebinds them on scroll
+    def __init__(self, parent, app, visible_rows=ROSTER_VISIBLE_ROWS):
+        self.app = app
+        self.first = 0  # Roster index shown in the top row
+
+        self.rows_frame = tk.Frame(parent, bg="#333333")
+        self.rows_frame.grid(row=0, column=0, sticky='nsew')
+        self.rows_frame.grid_columnconfigure(0, weight=1)
+
+        self.scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scroll)
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
+
+        self.panels = [PlayerPanel(self.rows_frame, row, app) for row in range(visible_rows)]
+        for panel in self.panels:
+            for widget in (panel.frame, panel.select_box, panel.label, panel.complete_button, panel.change_name_button):
+                widget.bind("<MouseWheel>", self.on_mousewheel)
+                widget.bind("<Button-4>", lambda event: self.scroll_to(self.first - 1))
+                widget.bind("<Button-5>", lambda event: self.scroll_to(self.first + 1))
+        self.refresh()
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == tk.MOVETO:
+            self.scroll_to(round(float(amount) * len(self.app.roster)))
+        elif unit == tk.PAGES:
+            self.scroll_to(self.first + int(amount) * len(self.panels))
+        else:
+            self.scroll_to(self.first + int(amount))
+
+    def on_mousewheel(self, event):
+        self.scroll_to(self.first - (1 if event.delta > 0 else -1))
+
+    def scroll_to(self, first):
+        first = max(0, min(first, len(self.app.roster) - len(self.panels)))
+        if first != self.first:
+            self.first = first
+            self.refresh()
+
+    def refresh(self):
+        roster = self.app.roster
+        for row, panel in enumerate(self.panels):
+            if self.first + row < len(roster):
+                panel.show(self.first + row)
+                panel.frame.grid()
+            else:
+                panel.frame.grid_remove()
+        if roster:
+            self.scrollbar.set(self.first / len(roster), min((self.first + len(self.panels)) / len(roster), 1.0))
+
+    def refresh_index(self, index):
+        if self.first <= index < self.first + len(self.panels):
+            self.panels[index - self.first].show(index)
+
+RESULTS_VISIBLE_ROWS = 10
+RESULT_SORTS = ("Time", "Name", "Level", "Distance")
+
+class ResultsModel:
+    # Every result shown this session in flat columns; views keep lists of indices into it
+    def __init__(self):
+        self.names = []
+        self.texts = []
+        self.levels = array("H")
+        self.shuttles = array("H")
+        self.distances = array("d")
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, text, level=0, shuttle=0, distance=0.0):
+        self.names.append(name)
+        self.texts.append(text)
+        self.levels.append(level)
+        self.shuttles.append(shuttle)
+        self.distances.append(distance)
+        return len(self.names) - 1
+
+    def sort_key(self, sort):
+        # Ties keep the order results came in; levels and distances are best first
+        if sort == "Name":
+            return lambda index: (self.names[index].lower(), index)
+        if sort == "Level":
+            return lambda index: (-self.levels[index], -self.shuttles[index], index)
+        if sort == "Distance":
+            return lambda index: (-self.distances[index], index)
+        return None
+
+    def matches(self, index, text):
+        # A number shows one level; anything else is part of a name
+        if not text:
+            return True
+        if text.isdigit():
+            return self.levels[index] == int(text)
+        return text.lower() in self.names[index].lower()
+
+class ResultsView:
+    # Sortable, filterable list of results that only has labels for the visible rows and only
+    # reconfigures the ones whose text changed
+    def __init__(self, parent, model, visible_rows=RESULTS_VISIBLE_ROWS):
+        self.model = model
+        self.order = []  # Model indices that pass the filter, in sort order
+        self.first = 0  # Position in `order` shown in the top row
+        self.sort = RESULT_SORTS[0]
+        self.filter = ""
+
+        controls = tk.Frame(parent, bg="#333333")
+        controls.grid(row=0, column=0, columnspan=2, sticky='ew', pady=(0, 5))
+        tk.Label(controls, text="Sort:", font=("Arial", 12), bg="#333333", fg="#FFFFFF").pack(side=tk.LEFT)
+        self.sort_var = tk.StringVar(value=self.sort)
+        tk.OptionMenu(controls, self.sort_var, *RESULT_SORTS, command=self.set_sort).pack(side=tk.LEFT, padx=5)
+        tk.Label(controls, text="Filter:", font=("Arial", 12), bg="#333333", fg="#FFFFFF").pack(side=tk.LEFT, padx=(10, 0))
+        self.filter_var = tk.StringVar(value="")
+        self.filter_entry = tk.Entry(controls, textvariable=self.filter_var, font=("Arial", 12), width=12)
+        self.filter_entry.pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
+        self.filter_entry.bind("<KeyRelease>", lambda event: self.set_filter(self.filter_var.get()))
+
+        rows_frame = tk.Frame(parent, bg="#2E2E2E")
+        rows_frame.grid(row=1, column=0, sticky='nsew')
+        rows_frame.grid_columnconfigure(0, weight=1)
+        self.scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scroll)
+        self.scrollbar.grid(row=1, column=1, sticky='ns')
+        parent.grid_rowconfigure(1, weight=1)
+        parent.grid_columnconfigure(0, weight=1)
+
+        self.labels = []
+        self.shown = []  # Text each label currently has
+        for row in range(visible_rows):
+            label = tk.Label(rows_frame, text="", font=("Arial", 12), anchor="w", bg="#2E2E2E", fg="#FFFFFF")
+            label.grid(row=row, column=0, sticky='ew')
+            label.bind("<MouseWheel>", self.on_mousewheel)
+            label.bind("<Button-4>", lambda event: self.scroll_to(self.first - 1))
+            label.bind("<Button-5>", lambda event: self.scroll_to(self.first + 1))
+            self.labels.append(label)
+            self.shown.append("")
+        self.render()
+
+    def add(self, indices):
+        # Results added together, e.g. a group dropping out at once, are drawn in one pass
+        indices = [index for index in indices if self.model.matches(index, self.filter)]
+        if not indices:
+            return
+        following = self.first >= len(self.order) - len(self.labels)
+        key = self.model.sort_key(self.sort)
+        if key is None:
+            self.order.extend(indices)
+        else:
+            for index in indices:
+                insort(self.order, index, key=key)
+        if following and key is None:
+            self.first = max(len(self.order) - len(self.labels), 0)  # Keep the newest result in view
+        self.render()
+
+    def set_sort(self, sort):
+        self.sort = sort
+        self.rebuild()
+
+    def set_filter(self, text):
+        text = text.strip()
+        if text != self.filter:
+            self.filter = text
+            self.rebuild()
+
+    def rebuild(self):
+        model = self.model
+        self.order = [index for index in range(len(model)) if model.matches(index, self.filter)]
+        key = model.sort_key(self.sort)
+        if key is not None:
+            self.order.sort(key=key)
+        self.first = 0
+        self.render()
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == tk.MOVETO:
+            self.scroll_to(round(float(amount) * len(self.order)))
+        elif unit == tk.PAGES:
+            self.scroll_to(self.first + int(amount) * len(self.labels))
+        else:
+            self.scroll_to(self.first + int(amount))
+
+    def on_mousewheel(self, event):
+        self.scroll_to(self.first - (1 if event.delta > 0 else -1))
+
+    def scroll_to(self, first):
+        first = max(0, min(first, len(self.order) - len(self.labels)))
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def render(self):
+        model = self.model
+        for row, label in enumerate(self.labels):
+            position = self.first + row
+            text = ""
+            if position < len(self.order):
+                index = self.order[position]
+                text = f"{model.names[index]} - {model.texts[index]}"
+            if text != self.shown[row]:
+                label.config(text=text)
+                self.shown[row] = text
+        if self.order:
+            self.scrollbar.set(self.first / len(self.order), min((self.first + len(self.labels)) / len(self.order), 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+STATS_REFRESH_MS = 500
+
+class StatsOverlay:
+    # Small always-on-top window with the live timings of the profiled methods
+    def __init__(self, root, profiler, interval_ms=STATS_REFRESH_MS):
+        self.root = root
+        self.profiler = profiler
+        self.interval_ms = interval_ms
+        self.window = tk.Toplevel(root)
+        self.window.title("Timing")
+        self.window.attributes("-topmost", True)
+        self.window.configure(bg="#333333")
+        self.label = tk.Label(self.window, text="", font=("Courier", 11), justify=tk.LEFT, bg="#333333", fg="#FFFFFF")
+        self.label.pack(padx=10, pady=10)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.pending = None  # Scheduled refresh, cancelled when the window is closed
+        self.refresh()
+
+    def refresh(self):
+        self.label.config(text=self.profiler.format_stats())
+        self.pending = self.root.after(self.interval_ms, self.refresh)
+
+    def close(self):
+        self.root.after_cancel(self.pending)
+        self.window.destroy()
+
+class LanesWindow:
+    # Several staggered tests on adjacent lanes, driven by one scheduler thread and sharing the app's audio
+    def __init__(self, app, lanes, stagger):
+        self.app = app
+        self.manager = SessionManager()
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Multi-Lane Session")
+        self.window.configure(bg="#333333")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.labels = []
+        for lane in range(lanes):
+            engine = self.manager.add_session(app.engine.timeline, LaneAudio(app.audio, lane), lane * stagger,
+                                              on_shuttle=lambda engine, lane=lane: self.update_lane(lane, engine))
+            row = tk.Frame(self.window, borderwidth=2, relief=tk.RAISED, bg="#2E2E2E")
+            row.pack(fill=tk.X, padx=10, pady=5)
+            label = tk.Label(row, text=f"Lane {lane + 1}: starts after {lane * stagger:.0f} s", font=("Arial", 14), bg="#2E2E2E", fg="#FFFFFF")
+            label.pack(side=tk.LEFT, padx=10, expand=True, fill=tk.X)
+            stop_button = tk.Button(row, text="Stop", font=("Arial", 12), command=lambda engine=engine: setattr(engine, "running", False), bg="#F44336", fg="#FFFFFF", relief=tk.FLAT)
+            stop_button.pack(side=tk.RIGHT, padx=10)
+            self.labels.append(label)
+
+        controls = tk.Frame(self.window, bg="#555555")
+        controls.pack(fill=tk.X, padx=10, pady=10)
+        self.start_button = tk.Button(controls, text="Start All", font=("Arial", 14), command=self.start, bg="#2196F3", fg="#FFFFFF", relief=tk.FLAT)
+        self.start_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5)
+        tk.Button(controls, text="Stop All", font=("Arial", 14), command=self.manager.stop, bg="#F44336", fg="#FFFFFF", relief=tk.FLAT).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5)
+
+    def start(self):
+        self.start_button.config(state=tk.DISABLED)
+        threading.Thread(target=self.manager.run, name="lanes", daemon=True).start()
+
+    def update_lane(self, lane, engine):
+        # Called on the scheduler thread
+        status = "" if engine.running else " (finished)"
+        self.app.ui.config(self.labels[lane], text=f"Lane {lane + 1}: Level {engine.level} Shuttle {engine.shuttle} "
+                                                   f"Distance {engine.total_distance:.1f} m{status}")
+
+    def close(self):
+        self.manager.stop()
+        self.window.destroy()
+
+# Seconds of "Get Ready!" before the first shuttle
+COUNTDOWN_SECONDS = 10
 
 class MSFTApp:
-    def __init__(self, root):
+    # Test state is owned by the engine; these keep the existing attribute names working
+    level = property(lambda self: self.engine.level)
+    shuttle = property(lambda self: self.engine.shuttle)
+    total_distance = property(lambda self: self.engine.total_distance)
+
+    @property
+    def running(self):
+        return self.engine.running
+
+    @running.setter
+    def running(self, value):
+        self.engine.running = value
+
+    def __init__(self, root, refresh_hz=DISPLAY_REFRESH_HZ, roster_size=10, results_path=results_log.RESULTS_LOG,
+                 profile=None, stream_port=None, profiler=None, athletes_path=athlete_store.ATHLETE_DB,
+                 tone_frequency=tones.TONE_FREQUENCY, tone_duration=tones.TONE_DURATION,
+                 checkpoint_path=checkpoint.CHECKPOINT_FILE, countdown=COUNTDOWN_SECONDS,
+                 keymap=input_devices.DEFAULT_KEYMAP, timing_report=False):
         self.root = root
+        self.profile = profile
+        self.timing_report = timing_report  # Print beep, display, audio and checkpoint timings after each run
+        self.profiler = profiler
+        # Optional live event stream for scoreboards and coach tablets
+        self.stream = live_stream.EventStream(port=stream_port) if stream_port is not None else None
         self.root.title("THE MULTI-STAGE FITNESS TEST")
         self.root.configure(bg="#333333")
 
         # Initialize attributes
-        self.level = 1
-        self.shuttle = 1
-        self.total_distance = 0
+        self.audio = DeferredAudio(tone_frequency=tone_frequency, tone_duration=tone_duration)
+        self.use_protocol(DEFAULT_PROTOCOL)
         self.speed = 0  # Initialize speed to avoid AttributeError
-        self.running = False
+        self.countdown = countdown  # Seconds of "Get Ready!" before the first shuttle
+        self.countdown_window = None
+        self.ui = UIDispatcher(root)
+        self.assets = AssetStore(root)
 
         # Make the window resizable
         self.root.grid_rowconfigure(0, weight=1)
@@ -120,6 +721,7 @@ class MSFTApp:
 
         self.timer_label = tk.Label(self.details_frame, text="Time: 0.000 s", font=("Arial", 18), bg="#444444", fg="#FFFFFF")
         self.timer_label.pack(side=tk.LEFT, padx=(5, 5))
+        self.timer_display = CountdownDisplay(self.timer_label, self.ui, refresh_hz)
 
         self.distance_label = tk.Label(self.details_frame, text="Total Distance: 0.0 m", font=("Arial", 18), bg="#444444", fg="#FFFFFF")
         self.distance_label.pack(side=tk.LEFT, padx=(5, 10))
@@ -144,15 +746,49 @@ class MSFTApp:
         self.players_frame.grid_rowconfigure(0, weight=1)
         self.players_frame.grid_columnconfigure(0, weight=1)
 
-        # Initialize Player Panels with reference to the app instance
-        self.players = [PlayerPanel(self.players_frame, i+1, self) for i in range(10)]
+        # Player state lives in the roster model; the view only has widgets for the visible rows
+        self.roster = RosterModel(roster_size)
+        self.roster_view = RosterView(self.players_frame, self)
+
+        # Ticked players all drop out at the moment this is pressed, so they share one result
+        self.drop_out_button = tk.Button(self.players_frame, text="Drop Out Selected", font=("Arial", 12), command=self.drop_out_selected, bg="#4CAF50", fg="#FFFFFF", relief=tk.FLAT)
+        self.drop_out_button.grid(row=1, column=0, columnspan=2, pady=(5, 0), sticky='ew')
+
+        # Keys 1-0 drop out the visible rows and Return drops out the ticked players, dated by when
+        # the key was pressed; pedals and clickers that act as keyboards work the same way
+        self.keymap = keymap
+        self.event_clock = input_devices.EventClock(self.engine.scheduler.clock)
+        self.root.bind("<KeyPress>", self.on_key)
 
         # Result Display Frame (moved to the right side of Players)
         self.result_frame = tk.LabelFrame(self.main_frame, text="Results", padx=10, pady=10, bg="#333333", fg="#FFFFFF")
         self.result_frame.grid(row=3, column=1, padx=10, pady=10, sticky='nsew')
 
-        self.result_display = tk.Text(self.result_frame, height=10, width=50, font=("Arial", 12), bg="#2E2E2E", fg="#FFFFFF")
-        self.result_display.pack(expand=True, fill=tk.BOTH)
+        self.result_model = ResultsModel()
+        self.result_view = ResultsView(self.result_frame, self.result_model)
+
+        # Completions are journaled to disk; pick up where a crashed session left off
+        recovered = results_log.recover_session(results_path)
+        self.results_log = results_log.ResultsLog(results_path)
+        # Completions are also kept per athlete across sessions
+        try:
+            self.athletes = athlete_store.AthleteStore(athletes_path)
+        except sqlite3.Error as error:  # Keep the app usable; results still go to the journal
+            self.athletes = None
+            print(f"Athlete database unavailable: {error}")
+        # Position of a test that was running when the app died, if it belongs to the recovered session
+        resume = checkpoint.load_checkpoint(checkpoint_path)
+        self.checkpoints = checkpoint.Checkpointer(checkpoint_path)
+        self.resume_state = None
+        if recovered:
+            self.session_id, records = recovered
+            if resume and resume.get("session") == self.session_id:
+                self.resume_state = resume
+            self.session_date = time.strftime("%Y-%m-%d", time.localtime(records[0]["time"]))
+            self.restore_session(records)
+        else:
+            self.session_id = time.strftime("%Y%m%d-%H%M%S")
+            self.session_date = time.strftime("%Y-%m-%d")
 
         self.update_protocol()
 
@@ -164,6 +800,16 @@ class MSFTApp:
         self.calculator_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="Tools", menu=self.calculator_menu)
         self.calculator_menu.add_command(label="Vo2max Calculator", command=self.BeepTestCalculator)
+        self.calculator_menu.add_command(label="Multi-Lane Session", command=self.open_lanes)
+        self.calculator_menu.add_command(label="Import Roster", command=self.import_roster)
+
+        # Protocol Menu: every protocol file is compiled once by the registry, so switching is instant
+        self.protocol_var = tk.StringVar(value=self.protocol_name)
+        self.protocol_menu = tk.Menu(self.calculator_menu, tearoff=0)
+        self.calculator_menu.add_cascade(label="Protocol", menu=self.protocol_menu)
+        for name in registry.names():
+            self.protocol_menu.add_radiobutton(label=registry.get(name)["name"], variable=self.protocol_var,
+                                               value=name, command=self.select_protocol)
 
          # Contact Developer Menu
         self.contact_menu = tk.Menu(self.menu_bar, tearoff=0)
@@ -178,6 +824,103 @@ class MSFTApp:
         # Exit Menu
         self.menu_bar.add_command(label="Exit", command=root.quit)
 
+        # Hot-path timing probes, only installed when profiling was asked for
+        if profiler:
+            for attribute in ("run_test", "update_timer", "update_info", "show_results"):
+                profiler.wrap(self, attribute)
+            profiler.wrap(self.audio, "play", "play_beep")
+            StatsOverlay(root, profiler)
+
+        # Heavy subsystems start once the window has been drawn
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        if self.profile is None:
+            self.audio.start()
+        else:
+            self.profile.mark("first paint")
+            self.audio.start(on_ready=lambda audio: self.ui.call(self.report_startup))
+        if self.resume_state:
+            self.offer_resume(self.resume_state)
+
+    def offer_resume(self, state):
+        if not messagebox.askyesno("Resume Test", f"The last test stopped unexpectedly at Level {state['level']} "
+                                   f"Shuttle {state['shuttle']}.\nResume from there?", parent=self.root):
+            self.checkpoints.clear()
+            return
+        if state["protocol"] != self.protocol_name and state["protocol"] in registry.names():
+            self.protocol_var.set(state["protocol"])
+            self.select_protocol()
+        # The scheduler lines its deadlines up with this shuttle when the run starts
+        self.engine.seek(state["index"])
+        self.update_protocol()
+        self.update_info()
+        self.start_test()
+
+    def report_startup(self):
+        finished = time.perf_counter()
+        self.profile.add("audio (background)", self.audio.load_ns / 1e9, finished)
+        if self.audio.engine:
+            self.profile.add("  mixer init", self.audio.engine.init_ns / 1e9, finished)
+            for name, load_ns in self.audio.engine.load_ns.items():
+                self.profile.add(f"  synthesise {name}", load_ns / 1e9, finished)
+        print(self.profile.report())
+
+    def select_protocol(self):
+        name = self.protocol_var.get()
+        if self.running:
+            self.protocol_var.set(self.protocol_name)  # Not while a test is running
+            return
+        self.use_protocol(name)
+        self.update_protocol()
+        self.update_info()
+
+    def use_protocol(self, name):
+        self.protocol_name = name
+        self.protocol = registry.get(name)["levels"]
+        self.engine = BeepTestEngine(registry.timeline(name), self.audio)
+
+    def open_lanes(self):
+        lanes = simpledialog.askinteger("Multi-Lane Session", f"Number of lanes (2-{MIXER_CUE_CHANNELS}):",
+                                        minvalue=2, maxvalue=MIXER_CUE_CHANNELS, parent=self.root)
+        if not lanes:
+            return
+        stagger = simpledialog.askfloat("Multi-Lane Session", "Seconds between lane starts:",
+                                        minvalue=0.0, initialvalue=30.0, parent=self.root)
+        if stagger is not None:
+            LanesWindow(self, lanes, stagger)
+
+    def import_roster(self):
+        if self.running or any(self.roster.completed):
+            messagebox.showinfo("Import Roster", "Import the roster before the test starts.", parent=self.root)
+            return
+        path = filedialog.askopenfilename(title="Import Roster", parent=self.root, filetypes=[
+            ("Roster files", "*.csv *.tsv *.txt *.xlsx"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            athletes, errors = roster_import.import_roster(path)
+        except (OSError, ValueError) as error:
+            messagebox.showerror("Import Roster", str(error), parent=self.root)
+            return
+        if not athletes:
+            messagebox.showerror("Import Roster", "No players found in the file.", parent=self.root)
+            return
+
+        # Fill the model first, then redraw the visible rows once
+        self.roster.load(athletes)
+        self.roster_view.first = 0
+        self.roster_view.refresh()
+        self.log_event("roster", athletes=athletes)
+
+        message = f"Imported {len(athletes)} players."
+        if errors:
+            lines = [f"Row {row}: {error}" for row, error in errors[:10]]
+            if len(errors) > 10:
+                lines.append(f"... and {len(errors) - 10} more")
+            message += f"\n\n{len(errors)} problems (age/sex left blank):\n" + "\n".join(lines)
+        messagebox.showinfo("Import Roster", message, parent=self.root)
+
     def BeepTestCalculator(self):
         # Create a popup window for the Beep Test Calculator
         calculator_window = tk.Toplevel(self.root)
@@ -252,29 +995,11 @@ class MSFTApp:
             level = int(level)
             shuttles = int(shuttles)
 
-            # Validate inputs
-            if not (1 <= level <= 21):
-                raise ValueError("Level out of range.")
-
-            # Calculate the sex factor
-            sex_factor = 1 if sex == "Male" else 0
-
-            # VO2max calculation using Léger et al. (1988) formula
-            vo2max = 31.025 + (3.238 * level) - (0.156 * age) - (0.646 * sex_factor)
+            # VO2max calculation using Léger et al. (1988) formula, validated against the protocol
+            value, rating = vo2max.score_one(age, sex, level, shuttles, protocol)
 
             # Display the result
-            self.result_var.set(f"{vo2max:.2f}")
-
-            # Determine rating based on VO2max value (example rating system)
-            if vo2max > 60:
-                rating = "Excellent"
-            elif vo2max > 50:
-                rating = "Good"
-            elif vo2max > 40:
-                rating = "Average"
-            else:
-                rating = "Below Average"
-        
+            self.result_var.set(f"{value:.2f}")
             self.rating_var.set(rating)
 
         except ValueError as e:
@@ -290,9 +1015,7 @@ class MSFTApp:
         how_to_use_window.configure(bg="#333333")
 
         #Add image
-        image = Image.open("book.png")  # Replace with your image file
-        image = image.resize((100, 100), Image.LANCZOS)  # Resize the image if needed
-        photo = ImageTk.PhotoImage(image)
+        photo = self.assets.photo("book.png", (100, 100))  # Decoded and resized once, then cached
 
         # Display the developer's profile picture at the top
         image_label = tk.Label(how_to_use_window, image=photo, bg="#333333")
@@ -324,9 +1047,7 @@ class MSFTApp:
         contact_window.configure(bg="#333333")
 
         # Load the developer's profile picture
-        image = Image.open("pic.png")  # Replace with your image file
-        image = image.resize((100, 100), Image.LANCZOS)  # Resize the image if needed
-        photo = ImageTk.PhotoImage(image)
+        photo = self.assets.photo("pic.png", (100, 100))  # Decoded and resized once, then cached
 
         # Display the developer's profile picture at the top
         image_label = tk.Label(contact_window, image=photo, bg="#333333")
@@ -343,16 +1064,31 @@ class MSFTApp:
 
 
     def update_protocol(self):
-        if self.level in protocol:
-            self.num_shuttles, self.speed = protocol[self.level]
-            self.info_label.config(text=f"Level: {self.level} Shuttle: {self.shuttle} Speed: {self.speed:.1f} km/h")
+        if self.level in self.protocol:
+            self.num_shuttles, self.speed = self.protocol[self.level]
+            self.ui.config(self.info_label, text=f"Level: {self.level} Shuttle: {self.shuttle} Speed: {self.speed:.1f} km/h")
 
     def start_test(self):
+        if self.engine.index >= len(self.engine.timeline):
+            messagebox.showinfo("Start Test", "The protocol has finished. Choose a protocol to run it again.", parent=self.root)
+            return
+        # Each run gets its own engine, so the thread of a run just stopped, which may still be
+        # asleep in a wait, only ever wakes to its own stopped engine
+        engine = BeepTestEngine(self.engine.timeline, self.audio)
+        engine.seek(self.engine.index)
+        self.engine = engine
         self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
-        self.show_countdown(10)
+        if self.countdown:
+            self.show_countdown(self.countdown)
+        # Journaled so a crash before the first drop-out still recovers this session and its checkpoint
+        self.log_event("start", protocol=self.protocol_name)
+        self.save_checkpoint(self.engine)
+        self.running = True
+        threading.Thread(target=self.run_test, args=(engine,), name="beep-test", daemon=True).start()
 
     def show_countdown(self, seconds):
+        # Only builds the window; the ticks and "Go!" are timed by the engine on the test thread
         countdown_window = tk.Toplevel(self.root)
         countdown_window.title("Get Ready!")
         countdown_window.geometry("300x200")
@@ -363,72 +1099,293 @@ class MSFTApp:
         label = tk.Label(countdown_window, text="Get Ready!", font=("Arial", 24), bg="#333333", fg="#FFFFFF")
         label.pack(expand=True)
 
-        time_label = tk.Label(countdown_window, text=f"{seconds}", font=("Arial", 48), bg="#333333", fg="#FFFFFF")
-        time_label.pack(expand=True)
-
-        def update_countdown():
-            nonlocal seconds
-            while seconds > 0:
-                time_label.config(text=f"{seconds}")
-                countdown_window.update()
-                time.sleep(1)
-                seconds -= 1
-            time_label.config(text="Go!")
-            countdown_window.update()
-            time.sleep(1)
-            countdown_window.destroy()  # Close the countdown window
-            self.running = True
-            threading.Thread(target=self.run_test).start()
-
-        # Start countdown update in a separate thread
-        threading.Thread(target=update_countdown).start()
+        self.countdown_label = tk.Label(countdown_window, text=f"{seconds}", font=("Arial", 48), bg="#333333", fg="#FFFFFF")
+        self.countdown_label.pack(expand=True)
+        self.countdown_window = countdown_window
+
+    def on_countdown(self, seconds_left):
+        if seconds_left:
+            self.ui.config(self.countdown_label, text=f"{seconds_left}")
+        else:
+            self.ui.config(self.countdown_label, text="Go!")
+            # Leave "Go!" up for a second
+            self.ui.call(self.root.after, 1000, self.close_countdown, self.countdown_window)
+
+    def close_countdown(self, window=None):
+        window = window or self.countdown_window
+        if window is self.countdown_window:
+            self.countdown_window = None
+        if window is not None:
+            try:
+                window.destroy()
+            except tk.TclError:
+                pass  # Already closed
 
     def stop_test(self):
         self.running = False
+        self.checkpoints.clear()  # Stopped on purpose; nothing to resume
+        self.close_countdown()
         self.start_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
 
-    def run_test(self):
-        while self.running and self.level <= len(protocol):
-            time_per_shuttle = calculate_time_per_shuttle(self.speed)
-            self.play_beep()
-            self.update_timer(time_per_shuttle)
-
-            self.shuttle += 1
-            self.total_distance += 20  # Update total distance after each shuttle
-            if self.shuttle > self.num_shuttles:
-                self.shuttle = 1
-                self.level += 1
-                if self.level <= len(protocol):
-                    self.update_protocol()  # Update speed and shuttles for the new level
-                else:
-                    self.running = False
-            self.update_info()
-
-    def play_beep(self):
-        pygame.mixer.music.load("beep.mp3")
-        pygame.mixer.music.play()
-
-    def update_timer(self, duration):
-        start_time = time.time()
-        while self.running and (time.time() - start_time) < duration:
-            remaining_time = duration - (time.time() - start_time)
-            self.timer_label.config(text=f"Time: {remaining_time:.3f} s")
-            self.root.update()
-        self.timer_label.config(text="Time: 0.000 s")
+    def run_test(self, engine):
+        report = engine.run(wait=lambda deadline_ns: self.update_timer(deadline_ns, engine),
+                            on_shuttle=self.on_shuttle, countdown=self.countdown,
+                            on_countdown=self.on_countdown)
+        if engine.index >= len(engine.timeline):
+            self.checkpoints.clear()  # Finished; nothing to resume
+        if self.timing_report:
+            print(self.format_timing_report(report))
+
+    def format_timing_report(self, report):
+        latency = self.audio.latency_report()
+        saved = self.checkpoints.report()
+        return "\n".join([
+            f"Beep timing: {report['beeps']} beeps, cumulative drift {report['cumulative_drift_ms']:.3f} ms, "
+            f"mean late {report['mean_late_ms']:.3f} ms, max late {report['max_late_ms']:.3f} ms",
+            f"Display: {self.timer_display.redraws} redraws in {self.timer_display.frames} frames, "
+            f"{self.timer_display.cpu_ms_per_second():.2f} ms CPU per second",
+            f"Audio: play() {latency['mean_play_ms']:.3f} ms mean / {latency['max_play_ms']:.3f} ms max, "
+            f"buffer {latency['buffer_ms']:.2f} ms, audible after ~{latency['audible_ms']:.2f} ms",
+            f"Checkpoints: {saved['writes']} written, save() {saved['mean_save_us']:.1f} us mean / "
+            f"{saved['max_save_us']:.1f} us max on the beep thread, write {saved['mean_write_ms']:.2f} ms mean / "
+            f"{saved['max_write_ms']:.2f} ms max in the background",
+        ])
+
+    def on_shuttle(self, engine):
+        if engine.running and engine.shuttle == 1:
+            self.update_protocol()  # Update speed and shuttles for the new level
+        self.update_info()
+        if engine.running:
+            self.save_checkpoint(engine)
+
+    def save_checkpoint(self, engine):
+        self.checkpoints.save({"session": self.session_id, "protocol": self.protocol_name, "index": engine.index,
+                               "level": engine.level, "shuttle": engine.shuttle,
+                               "distance": engine.total_distance, "time": time.time()})
+
+    def update_timer(self, deadline_ns, engine):
+        display = self.timer_display
+        cpu_start = time.thread_time_ns()
+        wall_start = time.perf_counter_ns()
+        next_frame = wall_start
+        # Frames never sleep into the scheduler's spin window, so a sleep overshoot cannot land on the beep
+        last_sleep = deadline_ns - engine.scheduler.spin_threshold_ns
+        while engine.running:
+            now = time.perf_counter_ns()
+            if now >= deadline_ns:
+                break
+            display.render(deadline_ns - now)
+            next_frame += display.frame_ns
+            if next_frame < last_sleep:
+                # Frame pacing does not need the scheduler's precision, so just sleep
+                time.sleep(max(next_frame - time.perf_counter_ns(), 0) / 1e9)
+            else:
+                engine.scheduler.wait_until(deadline_ns, lambda: engine.running)
+        display.render(0)
+        display.cpu_ns += time.thread_time_ns() - cpu_start
+        display.wall_ns += time.perf_counter_ns() - wall_start
 
     def update_info(self):
-        self.info_label.config(text=f"Level: {self.level} Shuttle: {self.shuttle} Speed: {self.speed:.1f} km/h")
-        self.distance_label.config(text=f"Total Distance: {self.total_distance:.1f} m")
-        self.root.update()
-
-    def show_result(self, player_name, result):
-        self.result_display.insert(tk.END, f"{player_name} - {result}\n")
-        self.result_display.yview(tk.END)
+        self.ui.config(self.info_label, text=f"Level: {self.level} Shuttle: {self.shuttle} Speed: {self.speed:.1f} km/h")
+        self.ui.config(self.distance_label, text=f"Total Distance: {self.total_distance:.1f} m")
+        self.publish("tick", retain=True, level=self.level, shuttle=self.shuttle, speed=self.speed,
+                     distance=self.total_distance, running=self.running)
+
+    def publish(self, event, retain=False, **fields):
+        if self.stream:
+            self.stream.publish({"event": event, "session": self.session_id, "protocol": self.protocol_name,
+                                 "time": time.time(), **fields}, retain)
+
+    def log_event(self, event, **fields):
+        self.results_log.append({"event": event, "session": self.session_id, "time": time.time(), **fields})
+
+    def restore_session(self, records):
+        results = []
+        for record in records:
+            if record["event"] == "roster":
+                self.roster.load([tuple(athlete) for athlete in record["athletes"]])
+                continue
+            if record["event"] == "start" and record.get("protocol") in registry.names():
+                # Completions that follow were run, stored and scored under this protocol
+                if record["protocol"] != self.protocol_name:
+                    self.use_protocol(record["protocol"])
+                continue
+            index = record.get("index")
+            if index is None:
+                continue
+            if index >= len(self.roster):
+                self.roster.add_players(index + 1 - len(self.roster))
+            if record["event"] == "rename":
+                self.roster.rename(index, record["name"])
+            elif record["event"] == "complete":
+                self.roster.names[index] = record["name"]
+                self.roster.complete(index, record["result"], record["level"], record["shuttle"],
+                                     record["distance"], record.get("elapsed", 0.0))
+                self.store_result(index)  # Results already stored are replaced, not duplicated
+                results.append((record["name"], record["result"], record["level"], record["shuttle"],
+                                record["distance"]))
+        self.show_results(results)
+        self.roster_view.refresh()
+
+    def on_key(self, event):
+        if isinstance(event.widget, (tk.Entry, tk.Text)):
+            return  # Typing, not a drop-out
+        self.handle_input(event.keysym, self.event_clock.stamp(event.time))
+
+    def submit_input(self, key, stamp_ns):
+        # Called on an input device's own thread
+        self.ui.call(self.handle_input, key, stamp_ns)
+
+    def handle_input(self, key, stamp_ns):
+        action = self.keymap.get(key)
+        if action is None or not self.running:
+            return
+        if action == input_devices.DROP_SELECTED:
+            self.drop_out_selected(stamp_ns)
+            return
+        index = self.roster_view.first + action
+        if index < len(self.roster) and not self.roster.completed[index]:
+            self.complete_players([index], stamp_ns)
+
+    def drop_out_selected(self, stamp_ns=None):
+        if stamp_ns is None:
+            stamp_ns = self.engine.scheduler.clock()
+        roster = self.roster
+        indices = [index for index in range(len(roster)) if roster.selected[index] and not roster.completed[index]]
+        if indices:
+            self.complete_players(indices, stamp_ns)
+
+    def resolve_dropout(self, stamp_ns):
+        # Level, completed shuttles, distance and elapsed seconds at `stamp_ns` on the scheduler clock
+        engine = self.engine
+        timeline = engine.timeline
+        if not self.running or engine.scheduler.start_ns is None:
+            return engine.level, engine.shuttle - 1, engine.total_distance, engine.elapsed()
+        elapsed = min(max(stamp_ns - engine.scheduler.start_ns, 0) / 1e9, timeline.total_time)
+        level, shuttle, distance = timeline.position(timeline.state_at(elapsed).index)
+        return level, shuttle - 1, distance, elapsed
+
+    def complete_players(self, indices, stamp_ns):
+        # Record every player in `indices` as dropping out at `stamp_ns`, then redraw the roster once
+        level, shuttle, distance, elapsed = self.resolve_dropout(stamp_ns)
+        result = f"Level {level} Shuttle {shuttle} Distance {distance:.1f} m"
+        for index in indices:
+            name = self.roster.names[index]
+            self.roster.complete(index, result, level, shuttle, distance, elapsed)
+            self.log_event("complete", index=index, name=name, level=level, shuttle=shuttle,
+                           distance=distance, elapsed=elapsed, result=result)
+            self.store_result(index)
+            self.publish("complete", index=index, name=name, level=level, shuttle=shuttle, distance=distance)
+        self.show_results([(self.roster.names[index], result, level, shuttle, distance) for index in indices])
+        self.roster_view.refresh()
+
+    def score(self, index):
+        # VO2max of a completed player, or None when age or sex is unknown or the protocol is not scored
+        roster = self.roster
+        if self.protocol_name != vo2max.PROTOCOL or not (roster.ages[index] and roster.sexes[index]):
+            return None
+        try:
+            return vo2max.score_one(roster.ages[index], roster.sexes[index], roster.levels[index],
+                                    roster.shuttles[index], self.protocol)[0]
+        except ValueError:
+            return None
+
+    def store_result(self, index):
+        roster = self.roster
+        if self.athletes is None or not roster.named[index]:
+            return  # "Player 7" is a different person in every session
+        self.athletes.add_result(roster.names[index], roster.teams[index], roster.sexes[index], self.session_id,
+                                 index, self.session_date, self.protocol_name, roster.levels[index], roster.shuttles[index],
+                                 roster.distances[index], roster.elapsed[index], roster.ages[index] or None,
+                                 self.score(index))
+
+    def save_archive(self, directory=session_archive.ARCHIVE_DIR):
+        roster = self.roster
+        rows = [index for index in range(len(roster)) if roster.completed[index]]
+        if not rows:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.session_id}.btsa")
+
+        # VO2max for every player with a known age and sex, scored in one batch
+        scores = array("d", [float("nan")]) * len(rows)
+        scored = [position for position, index in enumerate(rows)
+                  if self.protocol_name == vo2max.PROTOCOL and roster.ages[index] and roster.sexes[index]
+                  and roster.levels[index] in self.protocol]
+        if scored:
+            try:
+                values, _ = vo2max.score_batch([roster.ages[rows[position]] for position in scored],
+                                               [roster.sexes[rows[position]] for position in scored],
+                                               [roster.levels[rows[position]] for position in scored],
+                                               [roster.shuttles[rows[position]] for position in scored],
+                                               self.protocol)
+                for position, value in zip(scored, values):
+                    scores[position] = value
+            except ValueError:
+                pass  # Left as NaN
+        session_archive.write_session(path, self.session_id, self.protocol_name, {
+            "slot": [index + 1 for index in rows],
+            "name": [roster.names[index] if roster.named[index] else "" for index in rows],  # No placeholders
+            "team": [roster.teams[index] for index in rows],
+            "level": [roster.levels[index] for index in rows],
+            "shuttle": [roster.shuttles[index] for index in rows],
+            "distance": [roster.distances[index] for index in rows],
+            "elapsed": [roster.elapsed[index] for index in rows],
+            "vo2max": scores,
+        })
+        return path
+
+    def close(self, trace_path=None):
+        if self.profiler and trace_path:
+            self.profiler.write_chrome_trace(trace_path)
+        self.save_archive()
+        self.log_event("end")
+        self.results_log.close()
+        if self.athletes:
+            self.athletes.close()
+        self.checkpoints.clear()  # Closed normally; nothing to resume
+        self.checkpoints.close()
+        if self.stream:
+            self.stream.close()
+
+    def show_results(self, rows):
+        # `rows` are (player name, result text, level, shuttle, distance); the view redraws once for all of them
+        self.result_view.add([self.result_model.add(*row) for row in rows])
 
    
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="The Multi-Stage Fitness Test (20m shuttle run)")
+    parser.add_argument("--players", type=int, default=10, help="number of players in the roster")
+    parser.add_argument("--profile-startup", action="store_true", help="print how long each startup phase takes")
+    parser.add_argument("--stream-port", type=int, help="publish live events as JSON lines on this local TCP port")
+    parser.add_argument("--tone-hz", type=float, default=tones.TONE_FREQUENCY, help="pitch of the shuttle beep")
+    parser.add_argument("--tone-ms", type=float, default=tones.TONE_DURATION * 1000, help="length of the shuttle beep")
+    parser.add_argument("--countdown", type=int, default=COUNTDOWN_SECONDS, help="seconds of countdown before the first shuttle")
+    parser.add_argument("--input-device", action="append", default=[], help="Linux input device of a pedal or clicker (repeatable)")
+    parser.add_argument("--simulate-input", help="press keys at set times, e.g. '15:1,20.5:Return' (seconds after launch)")
+    parser.add_argument("--timing-report", action="store_true", help="print beep, display, audio and checkpoint timings after each run")
+    parser.add_argument("--trace", help="time the hot path, show the timings live and write a Chrome trace to this file")
+    args = parser.parse_args()
+
+    profile = StartupProfile() if args.profile_startup else None
+    if profile:
+        profile.mark("imports")
     root = tk.Tk()
-    app = MSFTApp(root)
+    if profile:
+        profile.mark("tk init")
+    profiler = profiling.Profiler() if args.trace else None
+    app = MSFTApp(root, roster_size=args.players, profile=profile, stream_port=args.stream_port, profiler=profiler,
+                  tone_frequency=args.tone_hz, tone_duration=args.tone_ms / 1000, countdown=args.countdown,
+                  timing_report=args.timing_report)
+    for path in args.input_device:
+        input_devices.EvdevDevice(path, app.submit_input).start()
+    if args.simulate_input:
+        input_devices.SimulatedDevice(input_devices.parse_script(args.simulate_input), app.submit_input).start()
+    if profile:
+        profile.mark("build window")
     root.mainloop()
+    app.close(args.trace)
@@ -0,0 +1,107 @@
+# Drop-out input from keys, keypads, foot pedals and HID clickers. Every event carries the time it
+# arrived on the scheduler's clock, so a busy main loop delays the update but not the result.
+#     python input_devices.py /dev/input/event5     (print what a pedal or clicker sends)
+import os
+import struct
+import threading
+import time
+
+DROP_SELECTED = "drop selected"  # Action: every ticked player drops out
+
+# Key name -> visible roster row (0 is the top row) or an action. Pedals and clickers usually
+# present themselves as keyboards sending Return, Page_Down or a function key.
+DEFAULT_KEYMAP = {
+    **{str((row + 1) % 10): row for row in range(10)},
+    **{f"KP_{(row + 1) % 10}": row for row in range(10)},
+    "Return": DROP_SELECTED,
+    "KP_Enter": DROP_SELECTED,
+    "Next": DROP_SELECTED,  # Page Down, sent by most presentation clickers
+    "F13": DROP_SELECTED,
+}
+
+class EventClock:
+    # Converts Tk event times (milliseconds on the window system's clock) to the scheduler clock.
+    # The smallest gap seen between an event's time and its callback is the delivery delay of an
+    # idle main loop; later events are dated by that offset instead of by when Tk got to them.
+    RESYNC_NS = 10_000_000_000  # Larger jumps mean the event clock wrapped or was reset
+
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.offset_ns = None
+
+    def stamp(self, event_time_ms):
+        now = self.clock()
+        event_ns = event_time_ms * 1_000_000
+        offset = now - event_ns
+        if self.offset_ns is None or offset < self.offset_ns or offset - self.offset_ns > self.RESYNC_NS:
+            self.offset_ns = offset
+        return event_ns + self.offset_ns
+
+class SimulatedDevice:
+    # Stand-in for a pedal or clicker: presses keys from a script of (seconds after start, key)
+    def __init__(self, script, submit, clock=time.perf_counter_ns):
+        self.script = sorted(script)
+        self.submit = submit  # submit(key, stamp_ns), called on the device thread
+        self.clock = clock
+        self.thread = threading.Thread(target=self._run, name="simulated-input", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        started = self.clock()
+        for seconds, key in self.script:
+            delay = started + round(seconds * 1e9) - self.clock()
+            if delay > 0:
+                time.sleep(delay / 1e9)
+            self.submit(key, self.clock())
+
+# Linux input event: struct timeval, type, code, value
+EVDEV_EVENT = struct.Struct("llHHi")
+EV_KEY = 1
+KEY_PRESS = 1
+# Kernel key codes of the keys in DEFAULT_KEYMAP; other codes are reported as "code<n>"
+EVDEV_KEYS = {
+    **{code: str((code - 1) % 10) for code in range(2, 12)},  # KEY_1 .. KEY_0
+    28: "Return", 96: "KP_Enter", 109: "Next", 183: "F13",
+    79: "KP_1", 80: "KP_2", 81: "KP_3", 75: "KP_4", 76: "KP_5", 77: "KP_6", 71: "KP_7", 72: "KP_8", 73: "KP_9", 82: "KP_0",
+}
+
+class EvdevDevice:
+    # Reads key presses straight from a Linux input device and dates them with the kernel's timestamp
+    def __init__(self, path, submit, clock=time.perf_counter_ns):
+        self.path = path
+        self.submit = submit
+        self.clock = clock
+        self.thread = threading.Thread(target=self._run, name=f"input-{os.path.basename(path)}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        with open(self.path, "rb", buffering=0) as device:
+            while True:
+                data = device.read(EVDEV_EVENT.size)
+                if len(data) < EVDEV_EVENT.size:
+                    break
+                seconds, microseconds, event_type, code, value = EVDEV_EVENT.unpack(data)
+                if event_type != EV_KEY or value != KEY_PRESS:
+                    continue
+                # The kernel stamps events with the wall clock; shift that onto the scheduler clock
+                age_ns = time.time_ns() - (seconds * 1_000_000_000 + microseconds * 1000)
+                self.submit(EVDEV_KEYS.get(code, f"code{code}"), self.clock() - max(age_ns, 0))
+
+def parse_script(text):
+    # "2.5:1,4:Return" -> [(2.5, "1"), (4.0, "Return")]
+    script = []
+    for item in text.split(","):
+        seconds, _, key = item.partition(":")
+        script.append((float(seconds), key))
+    return script
+
+if __name__ == "__main__":
+    import sys
+
+    device = EvdevDevice(sys.argv[1], lambda key, stamp_ns: print(f"{key} at {stamp_ns / 1e9:.6f} s"))
+    device.start()
+    device.thread.join()
@@ -0,0 +1,180 @@
+# Live event stream for scoreboards: newline-delimited JSON over a local TCP socket.
+# publish() only queues the event, so the beep thread never waits on a slow client.
+# Each client has a bounded send buffer; when it fills up the oldest events are dropped.
+#     python live_stream.py --port 8765     (stand-in client that prints every event)
+import json
+import queue
+import selectors
+import socket
+import threading
+from collections import deque
+
+STREAM_HOST = "127.0.0.1"
+STREAM_PORT = 8765
+CLIENT_BUFFER_BYTES = 64 * 1024  # Per-client limit of unsent data
+
+class _Client:
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = deque()  # Encoded lines waiting to be sent
+        self.size = 0
+        self.dropped = 0
+        self.partial = False  # First buffered line is half sent and must not be dropped
+
+class EventStream:
+    def __init__(self, host=STREAM_HOST, port=STREAM_PORT, buffer_bytes=CLIENT_BUFFER_BYTES):
+        self.buffer_bytes = buffer_bytes
+        self.events = queue.SimpleQueue()
+        self.retained = None  # Last retained event, sent to clients as soon as they connect
+        self.clients = {}
+        self.closed = False
+
+        self.server = socket.create_server((host, port))
+        self.server.setblocking(False)
+        self.address = self.server.getsockname()
+        # Writing a byte to the socket pair wakes the server thread when events are queued
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ)
+        self.selector.register(self.wake_reader, selectors.EVENT_READ)
+        self.thread = threading.Thread(target=self._serve, name="event-stream", daemon=True)
+        self.thread.start()
+
+    def publish(self, event, retain=False):
+        # Safe to call from any thread
+        self.events.put((json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n", retain))
+        self._wake()
+
+    def close(self):
+        self.closed = True
+        self._wake()
+        self.thread.join()
+
+    def _wake(self):
+        try:
+            self.wake_writer.send(b"\0")
+        except OSError:
+            pass  # Buffer full means a wake-up is already pending
+
+    def _serve(self):
+        while not self.closed:
+            for key, mask in self.selector.select():
+                if key.fileobj is self.server:
+                    self._accept()
+                elif key.fileobj is self.wake_reader:
+                    self._distribute()
+                else:
+                    client = self.clients.get(key.fileobj)
+                    if client is None:
+                        continue
+                    if mask & selectors.EVENT_READ:
+                        self._read(client)
+                    if mask & selectors.EVENT_WRITE and client.sock in self.clients:
+                        self._flush(client)
+        for client in list(self.clients.values()):
+            self._drop(client)
+        self.selector.close()
+        self.server.close()
+        self.wake_reader.close()
+        self.wake_writer.close()
+
+    def _accept(self):
+        try:
+            sock, _ = self.server.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        client = _Client(sock)
+        self.clients[sock] = client
+        self.selector.register(sock, selectors.EVENT_READ)
+        if self.retained:
+            self._queue(client, self.retained)
+            self._flush(client)
+
+    def _distribute(self):
+        try:
+            while self.wake_reader.recv(4096):
+                pass
+        except OSError:
+            pass
+        while True:
+            try:
+                line, retain = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if retain:
+                self.retained = line
+            for client in self.clients.values():
+                self._queue(client, line)
+        for client in list(self.clients.values()):
+            self._flush(client)
+
+    def _queue(self, client, line):
+        client.buffer.append(line)
+        client.size += len(line)
+        while client.size > self.buffer_bytes and len(client.buffer) > 1 + client.partial:
+            if client.partial:
+                dropped = client.buffer[1]
+                del client.buffer[1]
+            else:
+                dropped = client.buffer.popleft()
+            client.size -= len(dropped)
+            client.dropped += 1
+
+    def _flush(self, client):
+        while client.buffer:
+            data = client.buffer[0]
+            try:
+                sent = client.sock.send(data)
+            except BlockingIOError:
+                break
+            except OSError:
+                self._drop(client)
+                return
+            client.size -= sent
+            if sent < len(data):
+                client.buffer[0] = data[sent:]
+                client.partial = True
+                break
+            client.buffer.popleft()
+            client.partial = False
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.buffer else 0)
+        self.selector.modify(client.sock, events)
+
+    def _read(self, client):
+        # Clients only listen; anything they send is ignored and an empty read means they left
+        try:
+            if client.sock.recv(4096):
+                return
+        except BlockingIOError:
+            return
+        except OSError:
+            pass
+        self._drop(client)
+
+    def _drop(self, client):
+        self.clients.pop(client.sock, None)
+        try:
+            self.selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+
+def follow(host=STREAM_HOST, port=STREAM_PORT):
+    # Stand-in scoreboard: yields every event published by a running session
+    with socket.create_connection((host, port)) as sock:
+        for line in sock.makefile("r", encoding="utf-8"):
+            yield json.loads(line)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print the live event stream of a running beep test")
+    parser.add_argument("--host", default=STREAM_HOST)
+    parser.add_argument("--port", type=int, default=STREAM_PORT)
+    args = parser.parse_args()
+    for event in follow(args.host, args.port):
+        print(json.dumps(event, ensure_ascii=False))
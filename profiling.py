@@ -0,0 +1,106 @@
+# Opt-in timing probes for the hot path. Instrumented methods are replaced on the instance only
+# when profiling is switched on, so an app started without it runs exactly the original code.
+#     python final.py --trace trace.json      (open trace.json in chrome://tracing or Perfetto)
+import functools
+import itertools
+import json
+import threading
+import time
+from array import array
+
+RING_SIZE = 1 << 16  # Samples kept for the trace; must be a power of two
+
+class Profiler:
+    def __init__(self, ring_size=RING_SIZE):
+        self.mask = ring_size - 1
+        self.origin = time.perf_counter_ns()
+        self.names = []
+        # Ring buffer of samples, preallocated so recording never grows a container
+        self.probes = array("H", [0]) * ring_size
+        self.starts = array("q", [0]) * ring_size
+        self.durations = array("q", [0]) * ring_size
+        self.threads = array("Q", [0]) * ring_size
+        self.slots = itertools.count()  # next() is atomic, so threads never share a slot
+        # Running totals per probe, over every sample rather than only those still in the ring
+        self.counts = array("Q")
+        self.totals = array("q")
+        self.maxima = array("q")
+
+    def probe(self, name):
+        self.names.append(name)
+        self.counts.append(0)
+        self.totals.append(0)
+        self.maxima.append(0)
+        return len(self.names) - 1
+
+    def record(self, probe, start_ns, end_ns):
+        slot = next(self.slots) & self.mask
+        duration = end_ns - start_ns
+        self.probes[slot] = probe
+        self.starts[slot] = start_ns - self.origin
+        self.durations[slot] = duration
+        self.threads[slot] = threading.get_ident()
+        self.counts[probe] += 1
+        self.totals[probe] += duration
+        if duration > self.maxima[probe]:
+            self.maxima[probe] = duration
+
+    def wrap(self, owner, attribute, name=None):
+        # Replace owner.attribute with a timed version of itself
+        func = getattr(owner, attribute)
+        probe = self.probe(name or attribute)
+        clock = time.perf_counter_ns
+        record = self.record
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(probe, start, clock())
+
+        setattr(owner, attribute, timed)
+
+    def samples(self):
+        # (probe, start_ns, duration_ns, thread) of every sample still in the ring, oldest first
+        recorded = sum(self.counts)
+        size = self.mask + 1
+        first = max(recorded - size, 0)
+        for position in range(first, recorded):
+            slot = position & self.mask
+            yield self.probes[slot], self.starts[slot], self.durations[slot], self.threads[slot]
+
+    def stats(self):
+        report = []
+        recent = [[] for _ in self.names]
+        for probe, _, duration, _ in self.samples():
+            recent[probe].append(duration)
+        for probe, name in enumerate(self.names):
+            durations = sorted(recent[probe])
+            count = self.counts[probe]
+            report.append({
+                "name": name,
+                "count": count,
+                "mean_ms": self.totals[probe] / count / 1e6 if count else 0.0,
+                "p99_ms": durations[min(round(0.99 * (len(durations) - 1)), len(durations) - 1)] / 1e6 if durations else 0.0,
+                "max_ms": self.maxima[probe] / 1e6,
+            })
+        return report
+
+    def format_stats(self):
+        lines = [f"{'probe':<14}{'calls':>8}{'mean ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for row in self.stats():
+            lines.append(f"{row['name']:<14}{row['count']:>8}{row['mean_ms']:>10.3f}{row['p99_ms']:>10.3f}{row['max_ms']:>10.3f}")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path):
+        # Complete ("X") events in the Trace Event Format, timestamps in microseconds
+        events = [{"name": self.names[probe], "ph": "X", "ts": start / 1e3, "dur": duration / 1e3,
+                   "pid": 1, "tid": thread}
+                  for probe, start, duration, thread in self.samples()]
+        threads = {event["tid"] for event in events}
+        events.extend({"name": "thread_name", "ph": "M", "pid": 1, "tid": thread.ident, "args": {"name": thread.name}}
+                      for thread in threading.enumerate() if thread.ident in threads)
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
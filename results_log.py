@@ -0,0 +1,122 @@
+# Append-only results journal. Records are written by a background thread and fsynced in
+# batches, so callers never wait on the disk.
+import json
+import os
+import queue
+import threading
+import time
+
+RESULTS_LOG = "results.txt"
+
+# Longest time (seconds) a written record may sit in the OS cache before it is fsynced
+DURABILITY_WINDOW = 0.5
+
+# Bytes read at a time when recovery scans the journal from its end
+RECOVERY_BLOCK_SIZE = 1 << 16
+
+_CLOSE = object()  # Tells the writer thread to flush and stop
+
+class ResultsLog:
+    def __init__(self, path=RESULTS_LOG, durability_window=DURABILITY_WINDOW):
+        self.path = path
+        self.durability_window = durability_window
+        self.queue = queue.SimpleQueue()
+        self.written = 0
+        self.syncs = 0
+        self.thread = threading.Thread(target=self._writer, name="results-log", daemon=True)
+        self.thread.start()
+
+    def append(self, record):
+        # Safe to call from any thread; only queues the record
+        self.queue.put(record)
+
+    def close(self):
+        self.queue.put(_CLOSE)
+        self.thread.join()
+
+    def _writer(self):
+        with open(self.path, "a", encoding="utf-8") as log_file:
+            dirty = False
+            last_sync = time.monotonic()
+            while True:
+                timeout = None
+                if dirty:
+                    timeout = max(self.durability_window - (time.monotonic() - last_sync), 0)
+                try:
+                    records = [self.queue.get(timeout=timeout)]
+                except queue.Empty:
+                    records = []
+                # Write everything already queued in one batch
+                while True:
+                    try:
+                        records.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                closing = _CLOSE in records
+                lines = [json.dumps(record, ensure_ascii=False) + "\n" for record in records if record is not _CLOSE]
+                if lines:
+                    log_file.write("".join(lines))
+                    self.written += len(lines)
+                    dirty = True
+                if dirty and (closing or time.monotonic() - last_sync >= self.durability_window):
+                    log_file.flush()
+                    os.fsync(log_file.fileno())
+                    self.syncs += 1
+                    dirty = False
+                    last_sync = time.monotonic()
+                if closing:
+                    break
+
+def read_records(path=RESULTS_LOG):
+    # Every complete record in the journal; a line torn by a crash mid-write is skipped
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, encoding="utf-8") as log_file:
+        for line in log_file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+def _lines_from_end(log_file, block_size):
+    # Lines of a binary file, last first, reading it backwards one block at a time
+    log_file.seek(0, os.SEEK_END)
+    position = log_file.tell()
+    partial = b""
+    while position > 0:
+        step = min(block_size, position)
+        position -= step
+        log_file.seek(position)
+        lines = (log_file.read(step) + partial).split(b"\n")
+        partial = lines.pop(0)  # May be cut by the block boundary; completed by the next block
+        yield from reversed(lines)
+    yield partial
+
+def recover_session(path=RESULTS_LOG):
+    # Records of the last session if it never reached its "end" record, otherwise None. The journal
+    # is read backwards and only as far as the start of its last session, so startup stays fast
+    # however many sessions it holds.
+    if not os.path.exists(path):
+        return None
+    session = None
+    session_records = []
+    with open(path, "rb") as log_file:
+        for line in _lines_from_end(log_file, RECOVERY_BLOCK_SIZE):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Blank, or torn by a crash mid-write
+            if not session_records:
+                if record.get("event") == "end":
+                    return None
+                session = record.get("session")
+            elif record.get("session") != session:
+                break
+            session_records.append(record)
+    if not session_records:
+        return None
+    session_records.reverse()
+    return session, session_records
@@ -0,0 +1,152 @@
+# Bulk roster import from CSV, TSV and XLSX. Rows are streamed from the file rather than loaded
+# whole, and age/sex are validated so the results can be scored for VO2max later.
+import csv
+import os
+import zipfile
+from xml.etree.ElementTree import iterparse, ParseError
+
+# Accepted header names for each field (compared case-insensitively)
+HEADER_ALIASES = {
+    "name": ("name", "player", "athlete", "student", "full name"),
+    "age": ("age",),
+    "sex": ("sex", "gender"),
+    "team": ("team", "class", "club", "group"),
+}
+# Column order assumed when the file has no header row
+DEFAULT_COLUMNS = {"name": 0, "age": 1, "sex": 2, "team": 3}
+
+MIN_AGE = 5
+MAX_AGE = 99
+
+SEX_VALUES = {"male": "Male", "m": "Male", "female": "Female", "f": "Female"}
+
+_SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+def iter_rows(path):
+    # Every row of the file as a list of strings
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".xlsx":
+        yield from _iter_xlsx(path)
+        return
+    with open(path, newline="", encoding="utf-8-sig") as roster_file:
+        if extension in (".tsv", ".tab"):
+            dialect = csv.excel_tab
+        else:
+            sample = roster_file.read(4096)
+            roster_file.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+        yield from csv.reader(roster_file, dialect)
+
+def _column_index(reference):
+    # "C12" -> 2
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord("A") + 1
+    return index - 1
+
+def _iter_xlsx(path):
+    with zipfile.ZipFile(path) as workbook:
+        names = workbook.namelist()
+        shared = []
+        if "xl/sharedStrings.xml" in names:
+            with workbook.open("xl/sharedStrings.xml") as strings_file:
+                for _, element in iterparse(strings_file):
+                    if element.tag == _SHEET_NS + "si":
+                        shared.append("".join(text.text or "" for text in element.iter(_SHEET_NS + "t")))
+                        element.clear()
+        sheets = sorted(name for name in names if name.startswith("xl/worksheets/sheet") and name.endswith(".xml"))
+        sheet = "xl/worksheets/sheet1.xml" if "xl/worksheets/sheet1.xml" in names else sheets[0]
+        with workbook.open(sheet) as sheet_file:
+            for _, element in iterparse(sheet_file):
+                if element.tag != _SHEET_NS + "row":
+                    continue
+                row = []
+                for cell in element.iter(_SHEET_NS + "c"):
+                    column = _column_index(cell.get("r", "")) if cell.get("r") else len(row)
+                    cell_type = cell.get("t")
+                    if cell_type == "inlineStr":
+                        value = "".join(text.text or "" for text in cell.iter(_SHEET_NS + "t"))
+                    else:
+                        value_element = cell.find(_SHEET_NS + "v")
+                        value = value_element.text if value_element is not None and value_element.text else ""
+                        if cell_type == "s" and value:
+                            value = shared[int(value)]
+                    row.extend([""] * (column - len(row)))
+                    row.append(value)
+                element.clear()  # Keep memory flat however long the sheet is
+                yield row
+
+def _find_columns(row):
+    columns = {}
+    for position, heading in enumerate(row):
+        heading = heading.strip().lower()
+        for field, aliases in HEADER_ALIASES.items():
+            if heading in aliases and field not in columns:
+                columns[field] = position
+    return columns if "name" in columns else None
+
+def parse_age(text):
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        age = int(float(text))
+    except ValueError:
+        raise ValueError(f"age {text!r} is not a number") from None
+    if not (MIN_AGE <= age <= MAX_AGE):
+        raise ValueError(f"age {age} is outside {MIN_AGE}-{MAX_AGE}")
+    return age
+
+def parse_sex(text):
+    text = text.strip()
+    if not text:
+        return None
+    if text.lower() not in SEX_VALUES:
+        raise ValueError(f"sex {text!r} is not Male or Female")
+    return SEX_VALUES[text.lower()]
+
+def import_roster(path):
+    # Returns (athletes, errors). Each athlete is a (name, age, sex, team) tuple with None for missing
+    # or invalid age/sex and "" for no team; errors are (row number, message) pairs for rows that need attention.
+    try:
+        return _read_athletes(iter_rows(path))
+    except (csv.Error, zipfile.BadZipFile, ParseError, KeyError, IndexError) as error:
+        raise ValueError(f"Could not read {os.path.basename(path)}: {error}") from None
+
+def _read_athletes(rows):
+    athletes = []
+    errors = []
+    columns = None
+    for number, row in enumerate(rows, start=1):
+        if not any(cell.strip() for cell in row):
+            continue
+        if columns is None:
+            columns = _find_columns(row)
+            if columns is not None:
+                continue  # Header row
+            columns = DEFAULT_COLUMNS
+
+        def cell(field):
+            position = columns.get(field)
+            return row[position] if position is not None and position < len(row) else ""
+
+        name = cell("name").strip()
+        if not name:
+            errors.append((number, "missing name"))
+            continue
+        age = sex = None
+        try:
+            age = parse_age(cell("age"))
+        except ValueError as error:
+            errors.append((number, str(error)))
+        try:
+            sex = parse_sex(cell("sex"))
+        except ValueError as error:
+            errors.append((number, str(error)))
+        athletes.append((name, age, sex, cell("team").strip()))
+    return athletes, errors
@@ -0,0 +1,161 @@
+# Columnar archive of finished sessions: one small binary file per session, read back through
+# mmap without parsing so thousands of sessions load in well under a second. Each row carries the
+# athlete's name and team, so results can be followed across sessions and seasons.
+#     python session_archive.py archive/
+# Files ending in .parquet are written and read with pyarrow when it is installed; the default
+# .btsa format needs only the standard library. pyarrow is imported only when a .parquet file is
+# touched, so it never slows down starting the app.
+import importlib.util
+import mmap
+import os
+import struct
+import time
+from array import array
+
+ARCHIVE_DIR = "archive"
+MAGIC = b"BTSA"
+VERSION = 2  # Version 1 files have no name and team columns; they read back as empty strings
+
+# Column name and array typecode, widest first so every column stays aligned
+COLUMNS = [
+    ("distance", "d"),
+    ("elapsed", "d"),
+    ("vo2max", "d"),  # NaN when age or sex is unknown
+    ("slot", "I"),  # Roster position, only meaningful within its session
+    ("level", "H"),
+    ("shuttle", "H"),
+]
+# UTF-8 columns, stored after the numeric ones as row offsets followed by one blob
+TEXT_COLUMNS = ["name", "team"]
+
+# magic, version, row count, length of session id, length of protocol name
+HEADER = struct.Struct("<4sHIHH")
+
+def _padding(offset):
+    return -offset % 8
+
+def write_session(path, session_id, protocol_name, columns):
+    # `columns` maps each name in COLUMNS and TEXT_COLUMNS to a sequence of equal length
+    if path.endswith(".parquet"):
+        return _write_parquet(path, session_id, protocol_name, columns)
+    rows = len(columns["slot"])
+    session_bytes = session_id.encode("utf-8")
+    protocol_bytes = protocol_name.encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, rows, len(session_bytes), len(protocol_bytes)) + session_bytes + protocol_bytes
+    parts = [header, bytes(_padding(len(header)))]
+    for name, typecode in COLUMNS:
+        values = array(typecode, columns[name])
+        if len(values) != rows:
+            raise ValueError(f"Column {name} has {len(values)} rows, expected {rows}.")
+        data = values.tobytes()
+        parts.append(data)
+        parts.append(bytes(_padding(len(data))))
+    for name in TEXT_COLUMNS:
+        encoded = [value.encode("utf-8") for value in columns[name]]
+        if len(encoded) != rows:
+            raise ValueError(f"Column {name} has {len(encoded)} rows, expected {rows}.")
+        offsets = array("I", [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        for data in (offsets.tobytes(), b"".join(encoded)):
+            parts.append(data)
+            parts.append(bytes(_padding(len(data))))
+
+    # Write to a temporary file first so a crash never leaves a half-written archive
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as archive_file:
+        archive_file.write(b"".join(parts))
+        archive_file.flush()
+        os.fsync(archive_file.fileno())
+    os.replace(temp_path, path)
+
+def read_session(path):
+    # Returns (session_id, protocol_name, columns); columns are memoryviews over the mapped file
+    if path.endswith(".parquet"):
+        return _read_parquet(path)
+    with open(path, "rb") as archive_file:
+        mapped = mmap.mmap(archive_file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    magic, version, rows, session_length, protocol_length = HEADER.unpack_from(view)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError(f"{path} is not a version 1-{VERSION} session archive.")
+    offset = HEADER.size
+    session_id = bytes(view[offset:offset + session_length]).decode("utf-8")
+    offset += session_length
+    protocol_name = bytes(view[offset:offset + protocol_length]).decode("utf-8")
+    offset += protocol_length
+    offset += _padding(offset)
+
+    columns = {}
+    for name, typecode in COLUMNS:
+        size = rows * array(typecode).itemsize
+        columns[name] = view[offset:offset + size].cast(typecode)
+        offset += size + _padding(size)
+    for name in TEXT_COLUMNS:
+        if version == 1:
+            columns[name] = [""] * rows
+            continue
+        size = (rows + 1) * 4
+        offsets = view[offset:offset + size].cast("I")
+        offset += size + _padding(size)
+        blob = bytes(view[offset:offset + offsets[rows]])
+        columns[name] = [blob[offsets[row]:offsets[row + 1]].decode("utf-8") for row in range(rows)]
+        offset += offsets[rows] + _padding(offsets[rows])
+    return session_id, protocol_name, columns
+
+def load_sessions(paths):
+    # Concatenate many archives into one set of columns, plus a session index per row
+    combined = {name: array(typecode) for name, typecode in COLUMNS}
+    combined.update((name, []) for name in TEXT_COLUMNS)
+    session_ids = []
+    session_rows = array("I")
+    for path in paths:
+        session_id, _, columns = read_session(path)
+        for name, _ in COLUMNS:
+            combined[name].frombytes(memoryview(columns[name]).cast("B"))  # Straight copy of the mapped bytes
+        for name in TEXT_COLUMNS:
+            combined[name].extend(columns[name])
+        session_rows.extend(array("I", [len(session_ids)]) * len(columns["slot"]))
+        session_ids.append(session_id)
+    return session_ids, session_rows, combined
+
+def archive_paths(directory=ARCHIVE_DIR):
+    if not os.path.isdir(directory):
+        return []
+    parquet = importlib.util.find_spec("pyarrow") is not None  # Parquet support is optional
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith(".btsa") or (parquet and name.endswith(".parquet")))
+
+def _write_parquet(path, session_id, protocol_name, columns):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Writing .parquet archives needs pyarrow.") from None
+    names = [name for name, _ in COLUMNS] + TEXT_COLUMNS
+    table = pyarrow.table({name: list(columns[name]) for name in names})
+    table = table.replace_schema_metadata({"session": session_id, "protocol": protocol_name})
+    pyarrow.parquet.write_table(table, path)
+
+def _read_parquet(path):
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Reading .parquet archives needs pyarrow.") from None
+    table = pyarrow.parquet.read_table(path, memory_map=True)
+    metadata = table.schema.metadata or {}
+    columns = {name: array(typecode, table.column(name).to_pylist()) for name, typecode in COLUMNS}
+    columns.update((name, table.column(name).to_pylist()) for name in TEXT_COLUMNS)
+    return metadata.get(b"session", b"").decode(), metadata.get(b"protocol", b"").decode(), columns
+
+if __name__ == "__main__":
+    import sys
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else ARCHIVE_DIR
+    started = time.perf_counter()
+    session_ids, _, columns = load_sessions(archive_paths(directory))
+    elapsed = time.perf_counter() - started
+    rows = len(columns["slot"])
+    print(f"Loaded {len(session_ids)} sessions, {rows} results in {elapsed * 1000:.1f} ms")
+    if rows:
+        print(f"Mean distance {sum(columns['distance']) / rows:.1f} m, best {max(columns['distance']):.1f} m")
@@ -0,0 +1,103 @@
+# Headless regression tests for the shuttle state machine, run on a virtual clock
+#     python -m pytest tests
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from beep_engine import timeline, simulate, BeepTestEngine, NullAudio, VirtualClock, SessionManager
+
+class SimulateTest(unittest.TestCase):
+    def test_state_mid_shuttle_is_the_shuttle_being_run(self):
+        # While shuttle i is being run, results must read its level and shuttle and the distance
+        # covered before it started, not those of the next shuttle
+        seen = []
+        simulate(observe=lambda engine: seen.append((engine.index, engine.level, engine.shuttle, engine.total_distance)))
+        self.assertEqual(len(seen), len(timeline))
+        for position, (index, level, shuttle, distance) in enumerate(seen):
+            self.assertEqual(index, position)
+            self.assertEqual((level, shuttle, distance),
+                             (timeline.levels[index], timeline.shuttles[index], timeline.distances[index]))
+        self.assertEqual(seen[0][1:], (1, 1, 0.0))
+        self.assertEqual(seen[7][1:], (2, 1, 140.0))  # Level 1 has seven shuttles
+
+    def test_full_session(self):
+        engine = simulate()
+        self.assertEqual(len(engine.audio.played), len(timeline))
+        self.assertFalse(engine.running)
+        self.assertEqual((engine.level, engine.shuttle, engine.total_distance),
+                         (timeline.levels[-1] + 1, 1, timeline.total_distance))
+        self.assertEqual(engine.scheduler.drift_report()["max_late_ms"], 0.0)
+
+    def test_beeps_land_on_deadlines(self):
+        engine = simulate()
+        start_ns = engine.scheduler.start_ns
+        for index, (_, beep_ns) in enumerate(engine.audio.played):
+            self.assertEqual(beep_ns - start_ns, timeline.start_ns[index])
+
+    def test_start_mid_protocol(self):
+        start = timeline.index_of(5, 3)
+        engine = simulate(start_index=start)
+        self.assertEqual(len(engine.audio.played), len(timeline) - start)
+
+    def test_shuttle_outside_level_is_rejected(self):
+        for shuttle in (0, 8, -1):
+            with self.assertRaises(ValueError):
+                timeline.index_of(1, shuttle)  # Level 1 has seven shuttles
+            with self.assertRaises(ValueError):
+                timeline.elapsed_at(1, shuttle)
+        self.assertEqual(timeline.index_of(2, 1), 7)
+        self.assertEqual(timeline.index_of(99, 1), len(timeline))  # Past the last level
+
+    def test_shuttle_bookkeeping_never_delays_the_beep(self):
+        # on_shuttle runs after the next shuttle's beep, so slow bookkeeping cannot make it late
+        clock = VirtualClock()
+        engine = BeepTestEngine(timeline, NullAudio(clock), clock, clock.sleep, spin_threshold_ns=0)
+        engine.running = True
+        beeps_heard = []
+
+        def on_shuttle(engine):
+            beeps_heard.append(len(engine.audio.played))
+            clock.sleep(0.05)
+
+        engine.run(on_shuttle=on_shuttle)
+        self.assertEqual(beeps_heard, [min(count + 2, len(timeline)) for count in range(len(timeline))])
+        self.assertEqual(engine.scheduler.drift_report()["max_late_ms"], 0.0)
+
+    def test_session_manager_bookkeeping_never_delays_the_beep(self):
+        clock = VirtualClock()
+        manager = SessionManager(clock, clock.sleep, spin_threshold_ns=0)
+        engine = manager.add_session(timeline, NullAudio(clock), on_shuttle=lambda engine: clock.sleep(0.05))
+        manager.run()
+        self.assertEqual(len(engine.audio.played), len(timeline))
+        self.assertEqual(engine.scheduler.drift_report()["max_late_ms"], 0.0)
+
+    def test_stop_mid_shuttle_stays_on_it(self):
+        clock = VirtualClock()
+        engine = BeepTestEngine(timeline, NullAudio(clock), clock, clock.sleep, spin_threshold_ns=0)
+        engine.running = True
+
+        def wait(deadline_ns):
+            if engine.index == 3:
+                engine.running = False  # Stop pressed halfway through the fourth shuttle
+            engine.scheduler.wait_until(deadline_ns, lambda: engine.running)
+
+        shuttles = []
+        engine.run(wait=wait, on_shuttle=lambda engine: shuttles.append(engine.index))
+        self.assertEqual(engine.index, 3)
+        self.assertEqual(shuttles, [1, 2, 3])
+        self.assertEqual(len(engine.audio.played), 4)
+
+    def test_finished_protocol_runs_no_countdown(self):
+        clock = VirtualClock()
+        engine = BeepTestEngine(timeline, NullAudio(clock), clock, clock.sleep, spin_threshold_ns=0)
+        engine.seek(len(timeline))
+        engine.running = True
+        countdowns = []
+        engine.run(countdown=3, on_countdown=countdowns.append)
+        self.assertEqual((engine.audio.played, countdowns), ([], []))
+        self.assertFalse(engine.running)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# Replaying the results journal of a crashed session, without building the window
+#     python -m pytest tests
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import athlete_store
+from beep_engine import DEFAULT_PROTOCOL, registry
+from final import MSFTApp, DeferredAudio, RosterModel, ResultsModel
+
+def headless_app(athletes_path):
+    # Only the state restore_session touches; the views are stand-ins
+    app = MSFTApp.__new__(MSFTApp)
+    app.audio = DeferredAudio()
+    app.use_protocol(DEFAULT_PROTOCOL)
+    app.roster = RosterModel(0)
+    app.athletes = athlete_store.AthleteStore(athletes_path)
+    app.session_id = "20240101-090000"
+    app.session_date = "2024-01-01"
+    app.result_model = ResultsModel()
+    app.result_view = SimpleNamespace(add=lambda row: None)
+    app.roster_view = SimpleNamespace(refresh=lambda: None)
+    return app
+
+class RestoreSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.athletes_path = os.path.join(self.directory.name, "athletes.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def stored_results(self):
+        connection = sqlite3.connect(self.athletes_path)
+        try:
+            return connection.execute("SELECT slot, protocol, level, shuttle, vo2max FROM results ORDER BY slot").fetchall()
+        finally:
+            connection.close()
+
+    def restore(self, protocol_name):
+        app = headless_app(self.athletes_path)
+        app.restore_session([
+            {"event": "roster", "athletes": [["Ann", 14, "Female", "7B"], ["Bob", 15, "Male", "7B"]]},
+            {"event": "start", "protocol": protocol_name},
+            {"event": "complete", "index": 1, "name": "Bob", "level": 5, "shuttle": 2, "distance": 1000.0,
+             "elapsed": 300.0, "result": "Level 5 Shuttle 2"},
+        ])
+        app.athletes.close()
+        return app
+
+    def test_session_protocol_is_restored(self):
+        app = self.restore("yoyo-ir1")
+        self.assertEqual(app.protocol_name, "yoyo-ir1")
+        self.assertIs(app.engine.timeline, registry.timeline("yoyo-ir1"))
+        self.assertEqual(self.stored_results(), [(1, "yoyo-ir1", 5, 2, None)])  # Not scored with the MSFT equation
+
+    def test_default_protocol_is_scored(self):
+        app = self.restore(DEFAULT_PROTOCOL)
+        self.assertEqual(app.protocol_name, DEFAULT_PROTOCOL)
+        [(slot, protocol_name, level, shuttle, vo2max)] = self.stored_results()
+        self.assertEqual((slot, protocol_name, level, shuttle), (1, DEFAULT_PROTOCOL, 5, 2))
+        self.assertIsNotNone(vo2max)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# Recovering the last unfinished session from the results journal
+#     python -m pytest tests
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import results_log
+
+class RecoverSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.txt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, records, tail=""):
+        with open(self.path, "w", encoding="utf-8") as log_file:
+            log_file.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+            log_file.write(tail)
+
+    def session(self, session, count, end=False):
+        records = [{"event": "start", "session": session, "protocol": "msft-20m"}]
+        records += [{"event": "complete", "session": session, "index": index, "name": f"Zoë {index}"}
+                    for index in range(count)]
+        return records + [{"event": "end", "session": session}] if end else records
+
+    def test_no_journal(self):
+        self.assertIsNone(results_log.recover_session(self.path))
+
+    def test_finished_session_is_not_recovered(self):
+        self.write(self.session("a", 3, end=True))
+        self.assertIsNone(results_log.recover_session(self.path))
+
+    def test_last_unfinished_session_is_recovered(self):
+        last = self.session("b", 40)
+        self.write(self.session("a", 50, end=True) + last)
+        for block_size in (7, 64, results_log.RECOVERY_BLOCK_SIZE):  # Lines cut across block boundaries
+            with mock.patch.object(results_log, "RECOVERY_BLOCK_SIZE", block_size):
+                self.assertEqual(results_log.recover_session(self.path), ("b", last))
+
+    def test_torn_last_line_is_skipped(self):
+        last = self.session("b", 2)
+        self.write(self.session("a", 2, end=True) + last, tail='{"event": "compl')
+        self.assertEqual(results_log.recover_session(self.path), ("b", last))
+
+    def test_matches_a_full_read(self):
+        self.write(self.session("a", 5) + self.session("b", 5, end=True) + self.session("c", 5))
+        records = results_log.read_records(self.path)
+        self.assertEqual(results_log.recover_session(self.path), ("c", records[-6:]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+# Batch VO2max scoring: the NumPy path must score exactly like the plain Python one
+#     python -m pytest tests
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vo2max
+from beep_engine import protocol
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+AGES = [20, 14, 35, 16, 40, 12]
+SEXES = ["Male", "Female", "m", " F ", None, "female"]
+LEVELS = [5, 5, 9, 1, 12, 21]
+SHUTTLES = [0, 3, 9, 7, 12, 16]
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class ScoreBatchParityTest(unittest.TestCase):
+    def assertParity(self, sexes):
+        expected, expected_ratings = vo2max.score_batch(AGES, SEXES, LEVELS, SHUTTLES, protocol, use_numpy=False)
+        values, ratings = vo2max.score_batch(AGES, sexes, LEVELS, SHUTTLES, protocol)
+        for value, expected_value in zip(values, expected):
+            self.assertAlmostEqual(value, expected_value)
+        self.assertEqual(list(ratings), expected_ratings)
+
+    def test_list_with_none(self):
+        self.assertParity(SEXES)
+
+    def test_object_array(self):
+        self.assertParity(np.array(SEXES, dtype=object))
+
+    def test_string_array(self):
+        self.assertParity(np.array([sex or "" for sex in SEXES]))
+
+    def test_boolean_array(self):
+        self.assertParity(np.array([vo2max.is_male(sex) for sex in SEXES]))
+
+if __name__ == "__main__":
+    unittest.main()
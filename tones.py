@@ -0,0 +1,60 @@
+# Cue sounds synthesised as 16-bit PCM at startup, so playing a cue never touches a file or codec.
+# Each cue is a list of (frequency in Hz, duration in s) segments; frequency 0 is silence.
+import math
+from array import array
+
+TONE_FREQUENCY = 1000  # Hz of the shuttle beep
+TONE_DURATION = 0.25  # Seconds of the shuttle beep
+VOLUME = 0.6  # Fraction of full scale
+FADE = 0.005  # Seconds of fade in and out, so tones start and stop without a click
+
+def cue_definitions(frequency=TONE_FREQUENCY, duration=TONE_DURATION):
+    # Every cue the app plays, derived from the shuttle beep so one setting changes them all
+    short = duration * 0.5
+    gap = (0, duration * 0.4)
+    return {
+        "beep": [(frequency, duration)],  # Start of a shuttle
+        "double": [(frequency, short), gap, (frequency, short)],  # End of a run, recovery starts
+        "triple": [(frequency * 1.25, short), gap, (frequency * 1.25, short), gap, (frequency * 1.25, short)],  # New level
+        "tick": [(frequency * 0.8, 0.06)],  # Countdown seconds
+        "go": [(frequency * 1.5, duration * 2)],  # End of the countdown
+    }
+
+def synthesize(segments, sample_rate, channels=2, volume=VOLUME, use_numpy=True):
+    # Interleaved signed 16-bit samples for one cue, as bytes for pygame.mixer.Sound(buffer=...)
+    np = None
+    if use_numpy:
+        try:
+            import numpy as np  # Imported here so the module itself loads without it
+        except ImportError:  # NumPy is optional; the pure-Python path is only slower at startup
+            pass
+    if np is not None:
+        parts = []
+        for frequency, duration in segments:
+            count = round(duration * sample_rate)
+            if not frequency:
+                parts.append(np.zeros(count))
+                continue
+            wave = np.sin(2 * math.pi * frequency * np.arange(count) / sample_rate)
+            fade = min(round(FADE * sample_rate), count // 2)
+            if fade:
+                ramp = np.linspace(0.0, 1.0, fade)
+                wave[:fade] *= ramp
+                wave[-fade:] *= ramp[::-1]
+            parts.append(wave)
+        samples = (np.concatenate(parts) * volume * 32767).astype(np.int16) if parts else np.zeros(0, np.int16)
+        return np.repeat(samples, channels).tobytes()
+
+    samples = array("h")
+    for frequency, duration in segments:
+        count = round(duration * sample_rate)
+        if not frequency:
+            samples.extend(array("h", [0]) * (count * channels))
+            continue
+        fade = min(round(FADE * sample_rate), count // 2)
+        step = 2 * math.pi * frequency / sample_rate
+        for position in range(count):
+            gain = min(1.0, position / fade, (count - 1 - position) / fade) if fade else 1.0
+            value = int(math.sin(step * position) * gain * volume * 32767)
+            samples.extend([value] * channels)
+    return samples.tobytes()
@@ -0,0 +1,96 @@
+# VO2max scoring for the 20m shuttle run, kept free of any UI so whole cohorts can be scored at once.
+# NumPy is imported by score_batch() only, so scoring a single result never loads it.
+
+# Protocol the equation is applied to; results of other protocols are not scored
+PROTOCOL = "msft-20m"
+
+# Léger et al. (1988) coefficients as used by the calculator dialog
+INTERCEPT = 31.025
+LEVEL_COEFFICIENT = 3.238
+AGE_COEFFICIENT = 0.156
+SEX_COEFFICIENT = 0.646
+
+# Lower bounds (exclusive) of each rating, best first
+RATINGS = [
+    (60, "Excellent"),
+    (50, "Good"),
+    (40, "Average"),
+]
+LOWEST_RATING = "Below Average"
+
+def is_male(sex):
+    if isinstance(sex, str):
+        return sex.strip().lower() in ("male", "m")
+    return bool(sex)
+
+def fractional_level(level, shuttles, protocol):
+    # Level plus the completed share of its shuttles, e.g. level 5 shuttle 3 of 9 -> 5.333
+    if level not in protocol:
+        raise ValueError(f"Level {level} is not in the protocol.")
+    num_shuttles = protocol[level][0]
+    if not (0 <= shuttles <= num_shuttles):
+        raise ValueError(f"Level {level} has {num_shuttles} shuttles, got {shuttles}.")
+    return level + shuttles / num_shuttles
+
+def rate(vo2max):
+    for threshold, rating in RATINGS:
+        if vo2max > threshold:
+            return rating
+    return LOWEST_RATING
+
+def score_one(age, sex, level, shuttles, protocol):
+    level = fractional_level(level, shuttles, protocol)
+    sex_factor = 1 if is_male(sex) else 0
+    vo2max = INTERCEPT + (LEVEL_COEFFICIENT * level) - (AGE_COEFFICIENT * age) - (SEX_COEFFICIENT * sex_factor)
+    return vo2max, rate(vo2max)
+
+def score_batch(ages, sexes, levels, shuttles, protocol, use_numpy=True):
+    # Score columnar inputs in one call. Returns (vo2max, ratings): NumPy arrays when NumPy
+    # is available, otherwise lists.
+    if len(ages) != len(sexes) or len(ages) != len(levels) or len(ages) != len(shuttles):
+        raise ValueError("All columns must have the same length.")
+    np = None
+    if use_numpy:
+        try:
+            import numpy as np
+        except ImportError:  # NumPy is optional; fall back to plain Python loops
+            pass
+    if np is None:
+        vo2max = []
+        ratings = []
+        for age, sex, level, shuttle in zip(ages, sexes, levels, shuttles):
+            value, rating = score_one(age, sex, level, shuttle, protocol)
+            vo2max.append(value)
+            ratings.append(rating)
+        return vo2max, ratings
+
+    # Shuttles per level as a lookup table indexed by level (0 marks levels not in the protocol)
+    num_shuttles = np.zeros(max(protocol) + 1, dtype=np.int64)
+    for level, (count, _) in protocol.items():
+        num_shuttles[level] = count
+
+    ages = np.asarray(ages, dtype=np.float64)
+    levels = np.asarray(levels, dtype=np.int64)
+    shuttles = np.asarray(shuttles, dtype=np.int64)
+    if levels.size and (levels.min() < 0 or levels.max() >= len(num_shuttles)):
+        raise ValueError("Level out of range.")
+    level_shuttles = num_shuttles[levels]
+    if np.any(level_shuttles == 0):
+        raise ValueError("Level out of range.")
+    if np.any((shuttles < 0) | (shuttles > level_shuttles)):
+        raise ValueError("Shuttles out of range for level.")
+
+    sexes = np.asarray(sexes)
+    if sexes.dtype.kind in "US":
+        sex_factor = np.isin(np.char.lower(np.char.strip(sexes.astype(str))), ["male", "m"])
+    elif sexes.dtype.kind == "O":
+        # Strings mixed with None, pandas columns and the like: read each value as score_one would
+        sex_factor = np.fromiter(map(is_male, sexes), bool, len(sexes))
+    else:
+        sex_factor = sexes.astype(bool)
+
+    vo2max = (INTERCEPT + LEVEL_COEFFICIENT * (levels + shuttles / level_shuttles)
+              - AGE_COEFFICIENT * ages - SEX_COEFFICIENT * sex_factor)
+    conditions = [vo2max > threshold for threshold, _ in RATINGS]
+    ratings = np.select(conditions, [rating for _, rating in RATINGS], default=LOWEST_RATING)
+    return vo2max, ratings